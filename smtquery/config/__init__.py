@@ -43,16 +43,37 @@ class Configuration:
     def getSMTFilePath(self):
         return self._filepath
 
-def createSolvers (solverdata):
+# known holds all solver entries of the configuration, portfolio members given by name
+# are looked up there, so a portfolio can also be listed under verifiers
+def createSolvers (solverdata,known = None):
     solverarr = {}
+    known = solverdata if known == None else known
     
     for solvername,sdata in solverdata.items ():
-        solverarr[solvername] = smtquery.solvers.createSolver ( solvername,sdata["binary"])
+        if "members" in sdata:
+            # members are names of other solver entries or a mapping of member entries
+            members = sdata["members"]
+            if isinstance (members,list):
+                unknown = [name for name in members if name not in known]
+                if unknown:
+                    raise ValueError (f"Portfolio {solvername} has members that are no configured solvers: {', '.join (unknown)}")
+                members = {name : known[name] for name in members}
+            solverarr[solvername] = smtquery.solvers.portfolio.Portfolio (solvername,createSolvers (members,known))
+            if "limits" in sdata:
+                solverarr[solvername].setLimits (sdata["limits"])
+            continue
+        solverarr[solvername] = smtquery.solvers.createSolver ( solvername,sdata.get ("binary"),sdata.get ("backend","binary"))
+        solverarr[solvername].setInteractive (sdata.get ("interactive",False))
+        solverarr[solvername].setLimits (sdata.get ("limits"))
     return solverarr
 
 def createFrontScheduler (data):
     if data["name"] == "multiprocessing":
-        scheduler = smtquery.scheduling.multi.Queue (int(data["cores"]))        
+        scheduler = smtquery.scheduling.multi.Queue (int(data["cores"]),
+                                                     pin = data.get ("pin",False),
+                                                     reserved = int (data.get ("reserved_cores",0)),
+                                                     repetitions = int (data.get ("repetitions",1)),
+                                                     max_dispersion = float (data.get ("max_dispersion",0.1)))
     if data["name"] == "celery":
         scheduler = smtquery.scheduling.celerys.Queue ("HH")
     return scheduler
@@ -67,7 +88,11 @@ def createStorage (data):
             intels = data["intels"]
             
         storage = smtquery.storage.smt.db.DBFSStorage (data["root"],
-                                                       data["engine_string"]
+                                                       data["engine_string"],
+                                                       busy_timeout = data.get ("busy_timeout",30000),
+                                                       pool_size = data.get ("pool_size",5),
+                                                       write_behind = data.get ("write_behind"),
+                                                       catalog_check_interval = data.get ("catalog_check_interval",5)
         )
         smtquery.intel.makeIntelManager (intels) 
 
@@ -82,7 +107,10 @@ def readConfig (conffile):
     scheduler = createFrontScheduler (data["scheduler"])
     storage = createStorage (data["SMTStore"])
     runParameters = data["runParameters"]
-    verifiers = createSolvers ({k : data["solvers"][k] for k in data["verifiers"] if k in data["solvers"].keys() })
+    if "preprocess_cache" in runParameters or "preprocess_cache_size" in runParameters:
+        smtquery.solvers.preprocessed.configure (runParameters.get ("preprocess_cache",smtquery.solvers.preprocessed.DEFAULT_DIRECTORY),
+                                                 runParameters.get ("preprocess_cache_size",smtquery.solvers.preprocessed.CACHE_SIZE))
+    verifiers = createSolvers ({k : data["solvers"][k] for k in data["verifiers"] if k in data["solvers"].keys() },data["solvers"])
     filepath = data["SMTStore"]["root"]
     conf = Configuration (solverarr,storage,scheduler,runParameters,verifiers,filepath)
     
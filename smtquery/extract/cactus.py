@@ -2,32 +2,41 @@ import smtquery.ui
 from smtquery.solvers.solver import *
 
 class CactusPlot:
-    _results = dict()
     output_folder = "./output/cactus/"
 
+    def __init__ (self):
+        self._results = dict()
+        self._names = []
+
     @staticmethod
     def getName ():
         return "CactusPlot"
 
     def finalise(self,total):
+        self._collectResults()
         self._generateCactus(self._generateCactusData(),self.output_folder)
-        
+        # the plugin instance is reused by the next query
+        self.__init__ ()
+
     def __call__  (self,smtfile):
-        # collect results
+        # results are fetched in bulk when finalising
+        self._names.append(smtfile.getName())
+
+    def _collectResults(self):
         _storage = smtquery.config.conf.getStorage ()
-        b_input = smtfile.getName().split(":")
-        b_smtfile = _storage.searchFile(b_input[0],b_input[1],b_input[2])
-        if b_smtfile != None:
-            b_id = b_smtfile.getId() 
-            res = _storage.getResultsForBenchmarkId(b_id)
+        ids = _storage.getInstanceIds(self._names)
+        compare = smtquery.config.conf.getRunParameters ().get ("compare","wall")
+        solved = []
+        for b_id,res in _storage.getLatestResults(list(ids.values())):
             for s in res.keys():
                 if s not in self._results:
                     self._results[s] = []
                 if res[s]["result"] in [Result.NotSatisfied,Result.Satisfied]:
-                    self._results[s]+=[(b_id,res[s]["time"])]
-
-        #with smtquery.ui.output.makePlainMessager () as mess:
-        #    mess.message (smtfile.getName())
+                    solved.append((s,b_id,res[s]))
+        # one kind of time for the whole plot
+        times = measuredTimes([r for s,b_id,r in solved],compare)
+        for (s,b_id,r),t in zip(solved,times):
+            self._results[s]+=[(b_id,t)]
 
     def _generateCactusData(self):
         self._results = {s : sorted(self._results[s], key=lambda r:r[1]) for s in self._results.keys()}
@@ -3,13 +3,16 @@ from smtquery.solvers.solver import *
 from tabulate import *
 
 class InstanceTable:
-    _results = dict()
+    def __init__ (self):
+        self._results = dict()
+        self._names = []
 
     @staticmethod
     def getName ():
         return "InstanceTable"
 
     def finalise(self,total):
+        self._collectResults()
         if len(list(self._results.keys())) > 0:
             headers = ["Instance"]
             for s in self._results[list(self._results.keys())[0]].keys():
@@ -21,20 +24,23 @@ class InstanceTable:
                     c_row+=list(self._results[i][s].values())
                 rows+=[c_row]
             print(tabulate(rows, headers=headers))
+        # the plugin instance is reused by the next query
+        self.__init__ ()
 
     def __call__  (self,smtfile):
-        # collect results
-        _storage = smtquery.config.conf.getStorage ()
-        b_input = smtfile.getName().split(":")
-        b_smtfile = _storage.searchFile(b_input[0],b_input[1],b_input[2])
-        if b_smtfile != None:
-            if smtfile.getName() not in self._results:
-                self._results[smtfile.getName()] = dict()
+        # results are fetched in bulk when finalising
+        self._names.append(smtfile.getName())
 
-            b_id = b_smtfile.getId() 
-            res = _storage.getResultsForBenchmarkId(b_id)
+    def _collectResults(self):
+        _storage = smtquery.config.conf.getStorage ()
+        ids = _storage.getInstanceIds(self._names)
+        for name in self._names:
+            if name in ids and name not in self._results:
+                self._results[name] = dict()
+        byid = {i : name for name,i in ids.items()}
+        for b_id,res in _storage.getLatestResults(list(ids.values())):
             for s in res.keys():
-                self._results[smtfile.getName()][s] = {"Result" : res[s]["result"].name, "Time" : res[s]["time"]}
+                self._results[byid[b_id]][s] = {"Result" : res[s]["result"].name, "Time" : res[s]["time"]}
 
 def PullExtractor():
     return [InstanceTable]
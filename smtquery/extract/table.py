@@ -3,14 +3,18 @@ from smtquery.solvers.solver import *
 from tabulate import *
 
 class ResultsTable:
-    _results = dict()
     output_folder = "./output/cactus/"
 
+    def __init__ (self):
+        self._results = dict()
+        self._names = []
+
     @staticmethod
     def getName ():
         return "ResultsTable"
 
     def finalise(self,total):
+        self._collectResults()
         if len(list(self._results.keys())) > 0:
             rows = [[k] for k in self._results[list(self._results.keys())[0]].keys()]
             headers = [""]+[s for s in self._results.keys()]
@@ -18,15 +22,16 @@ class ResultsTable:
                 for i,e in enumerate(self._results[s].keys()):
                     rows[i]+=[self._results[s][e]]
             print(tabulate(rows, headers=headers))
+        # the plugin instance is reused by the next query
+        self.__init__ ()
 
     def __call__  (self,smtfile):
-        # collect results
+        # results are fetched in bulk when finalising
+        self._names.append(smtfile.getName())
+
+    def _collectResults(self):
         _storage = smtquery.config.conf.getStorage ()
-        b_input = smtfile.getName().split(":")
-        b_smtfile = _storage.searchFile(b_input[0],b_input[1],b_input[2])
-        if b_smtfile != None:
-            b_id = b_smtfile.getId() 
-            res = _storage.getResultsForBenchmarkId(b_id)
+        for name,res in _storage.getLatestResultsByName(self._names):
             for s in res.keys():
                 if s not in self._results:
                     self._results[s] = {"SAT" : 0, "UNSAT" : 0, "Unknown" : 0, "Timeout" : 0, "Crash" : 0, "Time w/o Timeout" : 0, "Total Time" : 0}
@@ -45,8 +50,5 @@ class ResultsTable:
                 else:
                     self._results[s]["Crash"]+=1
 
-        #with smtquery.ui.output.makePlainMessager () as mess:
-        #    mess.message (smtfile.getName())
-
 def PullExtractor():
     return [ResultsTable]
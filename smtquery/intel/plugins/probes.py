@@ -6,7 +6,6 @@ from smtquery.smtcon.expr import Sort
 import smtquery.qlang.predicates
 import os
 import pickle
-import tempfile
 import smtquery.smtcon.smt2expr
 from functools import partial
 
@@ -19,28 +18,35 @@ class Probes:
         self._pickleBasePath = "smtquery/data/pickle"
         self.use_cache = True
 
-    def _storeAST(self,smtfile,ast):
+    def _pickleFilePath(self,smtfile):
         rel_filepath = ''.join(f"/{f}" for f in smtfile.getName().split(":")[:-1])
         filename = smtfile.getName().split(":")[-1]
-        pickle_file_path = f"{self._pickleBasePath}{rel_filepath}/{smtfile.hashContent()}_{filename}.pickle"
+        return rel_filepath,f"{self._pickleBasePath}{rel_filepath}/{smtfile.hashContent()}_{filename}.pickle"
+
+    def _storeAST(self,smtfile,ast):
+        rel_filepath,pickle_file_path = self._pickleFilePath(smtfile)
         with open(pickle_file_path, 'wb') as handle:
             pickle.dump(ast, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
+    # plain files are parsed in place, archived or compressed instances from their content
+    def _parse(self,smtfile,filepath):
+        if filepath == None:
+            return self._smtprobe.getASTFromText (smtfile.SMTString())
+        return self._smtprobe.getAST (filepath)
+
     def getAST(self,smtfile,filepath):
         # for testing purpose
         if not self.use_cache:
-            return self._smtprobe.getAST (filepath)
+            return self._parse (smtfile,filepath)
 
-        rel_filepath = ''.join(f"/{f}" for f in smtfile.getName().split(":")[:-1])
-        filename = smtfile.getName().split(":")[-1]
-        pickle_file_path = f"{self._pickleBasePath}{rel_filepath}/{smtfile.hashContent()}_{filename}.pickle"
+        rel_filepath,pickle_file_path = self._pickleFilePath(smtfile)
         if not os.path.exists(self._pickleBasePath+rel_filepath):
             os.makedirs(self._pickleBasePath+rel_filepath)
         if os.path.isfile(pickle_file_path):
             with open(pickle_file_path, 'rb') as handle:
                 return pickle.load(handle)
         else:
-            pr = self._smtprobe.getAST (filepath)
+            pr = self._parse (smtfile,filepath)
             self._storeAST(smtfile,pr)
             return pr
    
@@ -51,12 +57,11 @@ class Probes:
                 self._storeAST(smtfile,ast)
 
     def getIntel (self, smtfile):
-        with tempfile.TemporaryDirectory () as tmpdir:
-            filepath = smtfile.copyOutSMTFile (tmpdir)
-            pr = self.getAST(smtfile,filepath)
-            for (name,c) in self.intels().items():
-                self.addIntel(smtfile,pr,c[0],c[1],name)
-            return pr
+        # parsed in place, the instance is never copied
+        pr = self.getAST(smtfile,smtfile.getPath() if smtfile.isPlainFile() else None)
+        for (name,c) in self.intels().items():
+            self.addIntel(smtfile,pr,c[0],c[1],name)
+        return pr
 
     def intels (self):
         return {
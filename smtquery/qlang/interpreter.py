@@ -9,9 +9,18 @@ class InstanceEnumerator:
     def append (self,gen):
         self._subgens.append (gen)
         
+    # overlapping FROM items (bench, bench:track) yield each instance once
     def enumerate (self):
+        if len(self._subgens) == 1:
+            yield from self._subgens[0]
+            return
+        seen = set ()
         for gen in self._subgens:
-            yield from gen
+            for smtfile in gen:
+                if smtfile.getName () in seen:
+                    continue
+                seen.add (smtfile.getName ())
+                yield smtfile
 
 
 class InstanceSelector:
@@ -29,18 +38,16 @@ class InstanceSelector:
             
     def visitBenchTrackInstances (self,node):
         storage = smtquery.config.conf.getStorage ()
-        for bb in storage.getBenchmarks ():
-            if node.getBenchmark ().replace(":","") == bb.getName ():
-                for track in bb.tracksInBenchmark ():
-                    if track.getName () == f"{node.getBenchmark()}:{node.getTrack()}":
-                        self._res = track.filesInTrack ()
+        track = storage.getTrack (node.getBenchmark ().replace(":",""),node.getTrack ())
+        if track != None:
+            self._res = track.filesInTrack ()
                 
         
     def visitBenchInstances (self,node):
         storage = smtquery.config.conf.getStorage ()
-        for bb in storage.getBenchmarks ():
-            if node.getBenchmark () == bb.getName ():
-                self._res = bb.filesInBenchmark ()
+        bb = storage.getBenchmark (node.getBenchmark ())
+        if bb != None:
+            self._res = bb.filesInBenchmark ()
     
     def visitAllInstances (self,node):
         storage = smtquery.config.conf.getStorage ()
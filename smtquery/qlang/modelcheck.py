@@ -0,0 +1,64 @@
+import logging
+import z3
+
+# Checks a model by evaluation instead of solving: the assignment of the stored model is
+# substituted into the parsed assertions and simplified. Ground assertions simplify to
+# true or false; anything else (missing assignments, function definitions, constructs z3
+# does not evaluate) is inconclusive and left to the verifier solvers.
+
+# (name,value) of every constant definition in the entries of a stored model
+def assignments (entries):
+    for entry in entries:
+        if isinstance (entry,str):
+            continue
+        name,parameters,sort,value = entry
+        if parameters != "()":
+            # a function definition cannot be substituted
+            raise ValueError (f"function {name} in model")
+        yield name,value
+
+def _constants (assertions):
+    consts = dict()
+    todo = list(assertions)
+    seen = set ()
+    while todo:
+        e = todo.pop ()
+        if e.get_id () in seen:
+            continue
+        seen.add (e.get_id ())
+        if z3.is_const (e) and e.decl ().kind () == z3.Z3_OP_UNINTERPRETED:
+            consts[e.decl ().name ()] = e
+        todo.extend (e.children ())
+    return consts
+
+# True if the model satisfies all assertions, False if it violates one, None if inconclusive
+def evaluate (assertions,entries):
+    consts = _constants (assertions)
+    pairs = []
+    for name,value in assignments (entries):
+        key = name[1:-1] if name.startswith ("|") else name
+        if key not in consts:
+            continue
+        eq = z3.parse_smt2_string (f"(assert (= {name} {value}))",decls = {key : consts[key]},ctx = consts[key].ctx)[0]
+        pairs.append ((consts[key],eq.arg (1)))
+
+    verdict = True
+    for a in assertions:
+        res = z3.simplify (z3.substitute (a,*pairs)) if pairs else z3.simplify (a)
+        if z3.is_false (res):
+            return False
+        if not z3.is_true (res):
+            verdict = None
+    return verdict
+
+def checkModel (smtfile,entries):
+    try:
+        ctx = z3.Context ()
+        if smtfile.isPlainFile ():
+            assertions = z3.parse_smt2_file (smtfile.getPath (),ctx = ctx)
+        else:
+            assertions = z3.parse_smt2_string (smtfile.SMTString (),ctx = ctx)
+        return evaluate (assertions,entries)
+    except (z3.Z3Exception,ValueError) as e:
+        logging.getLogger ().info (f"Evaluating the model of {smtfile.getName ()} is inconclusive: {e}")
+        return None
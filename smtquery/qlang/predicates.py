@@ -1,5 +1,7 @@
 import smtquery.config
 import smtquery.solvers.solver
+import smtquery.qlang.modelcheck
+import smtquery.storage.smt.models
 import re
 from smtquery.qlang.trool import *
 
@@ -22,19 +24,20 @@ class SolverInteraction:
         b_smtfile = self._storage.searchFile(b_input[0],b_input[1],b_input[2])
         if b_smtfile != None:
             b_id = b_smtfile.getId() 
-            res = self._storage.getResultsForBenchmarkId(b_id)
-            # make sure results are available for all solvers
-            if set(res.keys()) == set(self._solvers.keys()):
-                return res
-            # fall back
+            # make sure valid results are available for all solvers
+            cached = self._storage.cachedRuns ([b_id],self._solvers,self._run_parameters["timeout"],repetitions = self._schedule.getRepetitions ())
+            if len(cached) == len(self._solvers):
+                return self._storage.getResultsForBenchmarkId(b_id)
+            # fall back, running only the solvers without a valid cached result
             ll = []
             for key,solver in self._solvers.items ():
+                if (b_id,key) in cached:
+                    continue
                 res = self._schedule.runSolver (solver,smtfile,self._run_parameters["timeout"])
                 ll.append (res)                
+            # results are stored by the scheduler
             for r in ll:
                 r.wait ()
-                res = self._schedule.interpretSolverRes (r)
-                self._storage.storeResult (res,smtfile,solver)
             return self._storage.getResultsForBenchmarkId(b_id)
         return dict()
 
@@ -97,10 +100,15 @@ class SolverInteraction:
 
     ## verification
     def _isValidModel(self,smtfile,model):
-        model = self._extractAssignment(model)
-        smt_file_path = f'{self._file_root}' + ''.join(f"/{f}" for f in smtfile.getName().split(":"))
-        ast = smtquery.smtcon.smt2expr.Z3SMTtoSExpr().getAST(smt_file_path)
-        smt_ver_text = f"{ast._getPPSMTHeader()}\n{model}\n{ast._getPPAsserts()}\n{ast._getPPSMTFooter()}"
+        # the stored model is only loaded here
+        entries = model.entries() if model != None else []
+        # evaluate the model in process, verifier solvers only run if that is inconclusive
+        verdict = smtquery.qlang.modelcheck.checkModel(smtfile,entries)
+        if verdict != None:
+            return verdict
+        ast = self._parsedInstance(smtfile)
+        assignment = smtquery.storage.smt.models.renderAssignment(entries)
+        smt_ver_text = f"{ast._getPPSMTHeader()}\n{assignment}\n{ast._getPPAsserts()}\n{ast._getPPSMTFooter()}"
         ll = []
         verifier_results = []
         for key,verifier in self._verifiers.items():
@@ -114,16 +122,11 @@ class SolverInteraction:
         # a least on verfier has to validate the model
         return any(verifier_results)
 
-    def _extractAssignment(self,model):
-        s = ""
-        for l in model:
-            s+=l.rstrip("\n")
-        if s.startswith("(model"):
-            return s[len("(model"):-1]
-        elif s.startswith("sat("):
-            return s[len("sat("):-1]
-        else:
-            return s[len("("):-1]
+    # the AST cached by the Probes intel if available
+    def _parsedInstance(self,smtfile):
+        if hasattr(smtfile,"Probes"):
+            return smtfile.Probes
+        return smtquery.smtcon.smt2expr.Z3SMTtoSExpr().getASTFromText(smtfile.SMTString())
 
     ## SolverInteraction needs a better PLACE!
     
@@ -162,18 +165,35 @@ def isCorrectResult (smtfile,solvername):
     else:
         return Trool.FF
 
-# returns true if both solvers agree on a result and solver1 is faster than the other
+# returns true if both solvers agree on a result and solver1 is faster than the other,
+# maybe if they agree but the times of either are too noisy to rank them
 def isFaster (smtfile,solver1,solver2):
     si = SolverInteraction()
     res = si.getResultsForInstance(smtfile)
 
     # compare results
     validResults = set({smtquery.solvers.solver.Result.Satisfied,smtquery.solvers.solver.Result.NotSatisfied})
-    if (res[solver1]["result"] == res[solver2]["result"] and res[solver1]["time"] <= res[solver2]["time"]) or (res[solver1]["result"] in validResults and res[solver2]["result"] not in validResults):
+    if res[solver1]["result"] == res[solver2]["result"] and (res[solver1]["noisy"] or res[solver2]["noisy"]):
+        return Trool.Maybe
+    compare = smtquery.config.conf.getRunParameters ().get ("compare","wall")
+    time1,time2 = smtquery.solvers.solver.measuredTimes ([res[solver1],res[solver2]],compare)
+    if (res[solver1]["result"] == res[solver2]["result"] and time1 <= time2) or (res[solver1]["result"] in validResults and res[solver2]["result"] not in validResults):
         return Trool.TT
     else:
         return Trool.FF
 
+def isNoisy (smtfile,solvername):
+    si = SolverInteraction()
+    if si.getResultForSolver(smtfile,solvername)["noisy"]:
+        return Trool.TT
+    else:
+        return Trool.FF
+
+def makeNoisyPredicate (solvername):
+    def predicate (smtfile):
+        return isNoisy (smtfile,solvername)
+    return predicate
+
 def makeSatPredicate (solvername):
     def predicate (smtfile):
         return isSat (smtfile,solvername)
@@ -1,3 +1,4 @@
+import time
 import celery
 
 import smtquery.solvers
@@ -18,8 +19,10 @@ def setupCelery ():
         split = data["smtname"].split (":")
         file = smtquery.config.conf.getStorage().searchFile (split[0],split[1],split[2]) 
         if file:
-            res = solver.runSolver (file,timeout,store)
-            smtquery.config.conf.getStorage().storeResult (res,file,solver)
+            started = time.time ()
+            res = solver.runSolver (file,timeout)
+            res.addStats ({"queue_wait" : started - data.get ("submitted",started)})
+            store.storeResult (res,file,solver,timeout)
             
             return {"result" : res.getResult ().value,
                     "time" : res.getTime (),
@@ -39,9 +42,14 @@ class Queue:
     def runSolver (self,func,smtfile,timeout):
         serialize = {"solver" : func.getName (),
                      "smtname" : smtfile.getName (),
-                     "timeout" : timeout}
+                     "timeout" : timeout,
+                     "submitted" : time.time ()}
         return self._func.apply_async  (args =  (serialize,))
 
+    # benchmark repetitions are only supported by the multiprocessing scheduler
+    def getRepetitions (self):
+        return 1
+
     def interpretSolverRes (self,res):
         jss = res.get ()
         return smtquery.solvers.solver.VerificationResult ( smtquery.solvers.solver.Result(jss["result"]),
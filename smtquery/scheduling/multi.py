@@ -1,19 +1,62 @@
+import os
+import time
+import logging
 import functools
+import multiprocessing
 import multiprocessing.pool
 import smtquery.storage.smt
+import smtquery.solvers.solver
+import smtquery.solvers.staging
 
-def callback (solver,smtfile,res):
+def callback (solver,smtfile,timeout,res):
     store = smtquery.config.conf.getStorage ()
-    store.storeResult (res,smtfile,solver)
-    
+    store.storeResult (res,smtfile,solver,timeout)
 
+
+# runs in the pool worker, the time since submission is the queue wait
+def run (solver,smtfile,timeout,submitted,repetitions = 1,max_dispersion = 0.1):
+    started = time.time ()
+    if repetitions > 1:
+        res = smtquery.solvers.solver.runRepeated (solver,smtfile,timeout,repetitions,max_dispersion)
+    else:
+        res = solver.runSolver (smtfile,timeout)
+    res.addStats ({"queue_wait" : started - submitted})
+    return res
+
+# pins a pool worker, and so the solvers it starts, to a core of its own
+def _pin (cores):
+    worker = multiprocessing.current_process ()._identity[0]
+    os.sched_setaffinity (0,{cores[(worker - 1) % len(cores)]})
+
+# Benchmarking mode: with pin each worker gets a dedicated core, the first reserved cores
+# are left to the main process and the rest of the system; every run is repeated
+# repetitions times (see smtquery.solvers.solver.runRepeated).
 class Queue:
-    def __init__(self,N = 5):
-        self._pool = multiprocessing.pool.Pool (N)
+    def __init__(self,N = 5,pin = False,reserved = 0,repetitions = 1,max_dispersion = 0.1):
+        self._repetitions = repetitions
+        self._max_dispersion = max_dispersion
+        # before the workers are forked, so their scratch directories are removed with it
+        smtquery.solvers.staging.scratchTree ()
+        if not pin:
+            self._pool = multiprocessing.pool.Pool (N)
+            return
+        available = sorted (os.sched_getaffinity (0))
+        cores = available[reserved:]
+        if not cores:
+            raise ValueError (f"No cores left to pin workers to, {len(available)} available and {reserved} reserved")
+        if N > len(cores):
+            logging.getLogger ().warning (f"Only {len(cores)} cores to pin workers to, using {len(cores)} workers instead of {N}")
+            N = len(cores)
+        self._pool = multiprocessing.pool.Pool (N,initializer = _pin,initargs = (cores[:N],))
+        if reserved > 0:
+            os.sched_setaffinity (0,set (available[:reserved]))
+
+    def getRepetitions (self):
+        return self._repetitions
 
     def runSolver (self,func,smtfile,timeout):
-        resfunc = functools.partial (callback,func,smtfile)
-        return self._pool.apply_async (func.runSolver,(smtfile,timeout),callback = resfunc)
+        resfunc = functools.partial (callback,func,smtfile,timeout)
+        return self._pool.apply_async (run,(func,smtfile,timeout,time.time (),self._repetitions,self._max_dispersion),callback = resfunc)
 
     def runSolverOnText (self,func,text,timeout):
         resfunc = functools.partial (callback,func,text)
@@ -21,7 +64,6 @@ class Queue:
 
     def interpretSolverRes (self,res):
         return res.get ()
-    
+
     def workerQueue (self):
         pass
-
@@ -2,18 +2,22 @@ import logging
 import shutil
 import smtquery.solvers.cvc4
 import smtquery.solvers.z3
+import smtquery.solvers.z3api
+import smtquery.solvers.portfolio
 import smtquery.solvers.solver
 import yaml
 
 solverarr = {}
 
-def createSolver (name,binarypath):
+def createSolver (name,binarypath,backend = "binary"):
+    # the Z3 configurations can run in process through the z3 Python API
+    z3class = smtquery.solvers.z3api.Z3API if backend == "api" else smtquery.solvers.z3.Z3
     if name == "CVC4":
         return smtquery.solvers.cvc4.CVC4 (binarypath)
     elif name == "Z3Str3":
-        return smtquery.solvers.z3.Z3 (binarypath,"Str3","z3str3")
+        return z3class (binarypath,"Str3","z3str3")
     elif name == "Z3Seq":
-        return smtquery.solvers.z3.Z3 (binarypath,"Seq","seq")
+        return z3class (binarypath,"Seq","seq")
     else:
         raise "Unknown Solver Instance"
 
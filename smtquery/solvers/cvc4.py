@@ -2,7 +2,12 @@ import smtquery.solvers.solver as solver
 import subprocess
 import re
 
+# annotations removed from the instance and the logic, which is changed to QF_SLIA
+_REWRITE = re.compile (r"\(get-model\)|\(check-sat\)|\(exit\)|\(set-info :status (?:un)?sat\)|\(set-logic.*?\)")
+
 class CVC4(solver.Solver):
+    PREPROCESS_VERSION = 2
+
     def __init__(self,binarypath):
         super().__init__(binarypath)
         self._path = binarypath
@@ -14,26 +19,28 @@ class CVC4(solver.Solver):
         return "CVC4"
     
     def preprocessSMTFile  (self, origsmt, newsmt):
-        #set logic present?
+        with open(origsmt,'r') as orig:
+            text = orig.read ()
+
+        # set logic present outside of comments?
         setLogicPresent = False
-        with open(origsmt,'r') as flc:
-            for l in flc:
-                if not l.startswith(";") and '(set-logic' in l:
-                    setLogicPresent = True
+        def rewrite (m):
+            nonlocal setLogicPresent
+            if m.group ().startswith ("(set-logic"):
+                setLogicPresent = setLogicPresent or text[text.rfind ("\n",0,m.start ()) + 1] != ";"
+                return "(set-logic QF_SLIA)"
+            # remove annotations
+            return ""
+        text = _REWRITE.sub (rewrite,text)
 
-        with open(origsmt,'r') as orig, open(newsmt,'w') as new:
+        with open(newsmt,'w') as new:
             if not setLogicPresent:
                 new.write("(set-logic QF_SLIA)\n")
-            for l in orig:
-                # remove annotations
-                for exp in ["\(get-model\)","\(check-sat\)","\(exit\)","\(set-info :status sat\)","\(set-info :status unsat\)"]:
-                    l = re.sub(exp, '', l)
-
-                # change logic if needed
-                if "(set-logic" in l:
-                    l = re.sub('\(set-logic.*?\)', '(set-logic QF_SLIA)', l)
-                new.write(l)
+            new.write(text)
             new.write("\n(check-sat)")        
 
     def buildCMDList (self,smtfilepath):
-        return [self._path,"--lang","smtlib2.5","-m","--no-interactive-prompt","--strings-exp","--dump-models",smtfilepath]
\ No newline at end of file
+        return [self._path,"--lang","smtlib2.5","-m","--no-interactive-prompt","--strings-exp","--dump-models",smtfilepath]
+
+    def buildInteractiveCMDList (self):
+        return [self._path,"--lang","smtlib2.5","-m","--interactive","--no-interactive-prompt","--strings-exp","--dump-models"]
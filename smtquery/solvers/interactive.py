@@ -0,0 +1,109 @@
+import os
+import re
+import time
+import uuid
+import atexit
+import threading
+import subprocess
+import smtquery.solvers.runner
+
+# Long-lived solver processes fed over stdin. A job is the instance text followed by an
+# (echo) of a per-process sentinel; the output up to the sentinel is the solver's answer.
+# Jobs are separated by (reset). A watchdog kills the process when a job overruns its
+# deadline, together with its process group; killed or crashed processes are restarted
+# for the next job.
+# Processes are kept per worker process and thread, so they are never shared.
+
+_EXIT = re.compile (r"\(\s*exit\s*\)")
+
+class InteractiveProcess:
+    def __init__ (self,cmd):
+        self._cmd = cmd
+        self._sentinel = f"smtquery-{uuid.uuid4 ().hex}"
+        self._proc = None
+
+    def _start (self):
+        self._proc = subprocess.Popen (self._cmd,
+                                       stdin = subprocess.PIPE,
+                                       stdout = subprocess.PIPE,
+                                       stderr = subprocess.DEVNULL,
+                                       text = True,
+                                       bufsize = 1,
+                                       start_new_session = True)
+        self._fresh = True
+
+    def alive (self):
+        return self._proc != None and self._proc.poll () == None
+
+    def close (self):
+        if self._proc != None:
+            smtquery.solvers.runner.killGroup (self._proc.pid)
+            self._proc.wait ()
+            self._proc = None
+
+    # returns (stdout,elapsed,status), status is "ok", "timeout" or "crashed"
+    def run (self,text,timeout = None):
+        if not self.alive ():
+            self._start ()
+        job = _EXIT.sub ("",text)
+        if not self._fresh:
+            job = "(reset)\n" + job
+        self._fresh = False
+
+        expired = threading.Event ()
+        def watchdog ():
+            expired.set ()
+            smtquery.solvers.runner.killGroup (self._proc.pid)
+        timer = threading.Timer (timeout,watchdog) if timeout != None else None
+
+        # fed from a thread of its own: with the whole job written before reading, a solver
+        # blocked on a full stdout pipe would never take the rest of a large job
+        proc = self._proc
+        def feed ():
+            try:
+                proc.stdin.write (f"{job}\n(echo \"{self._sentinel}\")\n")
+                proc.stdin.flush ()
+            except (OSError,ValueError):
+                # the process is gone, reading its output ends as well
+                pass
+        feeder = threading.Thread (target = feed,daemon = True)
+
+        # z3 echoes the string as it is, SMT-LIB 2.6 solvers (cvc5, ...) as a string literal
+        sentinels = (self._sentinel,f'"{self._sentinel}"')
+        lines = []
+        start = time.perf_counter ()
+        try:
+            if timer != None:
+                timer.start ()
+            feeder.start ()
+            for line in self._proc.stdout:
+                if line.strip () in sentinels:
+                    break
+                lines.append (line)
+            else:
+                raise EOFError ()
+        except (OSError,EOFError,ValueError):
+            elapsed = time.perf_counter () - start
+            self.close ()
+            return "".join (lines),elapsed,"timeout" if expired.is_set () else "crashed"
+        finally:
+            if timer != None:
+                timer.cancel ()
+            feeder.join ()
+        return "".join (lines),time.perf_counter () - start,"ok"
+
+_processes = dict()
+
+def process (cmd):
+    key = (os.getpid (),threading.get_ident (),tuple (cmd))
+    if key not in _processes:
+        _processes[key] = InteractiveProcess (cmd)
+    return _processes[key]
+
+def closeAll ():
+    for key,proc in list(_processes.items ()):
+        if key[0] == os.getpid ():
+            proc.close ()
+    _processes.clear ()
+
+atexit.register (closeAll)
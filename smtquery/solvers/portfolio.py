@@ -0,0 +1,85 @@
+import queue
+import hashlib
+import logging
+import threading
+import smtquery.solvers.runner
+from smtquery.solvers.solver import Solver,Result,VerificationResult
+
+# A virtual solver running its members concurrently on one instance. The first
+# definitive answer (sat or unsat) wins and the other members are cancelled at once;
+# the result is stored under the portfolio's name with the winning member recorded.
+# Without a definitive answer the result is Unknown if a member gave up, TimeOut if one
+# ran out of time and ErrorTermination otherwise.
+
+_FALLBACK = [Result.Unknown,Result.TimeOut,Result.ErrorTermination]
+
+class Portfolio(Solver):
+    def __init__ (self,name,members):
+        super().__init__ (None)
+        self._name = name
+        self._members = members
+
+    def getName (self):
+        return self._name
+
+    def getMembers (self):
+        return self._members
+
+    def getVersion (self):
+        return f"Portfolio ({', '.join (self._members.keys ())})"
+
+    # the portfolio changes whenever a member's binary, version or options change
+    def calcHash (self):
+        sha = hashlib.sha256 ()
+        for name,member in self._members.items ():
+            sha.update (f"{name}\0{member.solverHash ()}\0{member.solverVersion ()}\0{member.solverOptions ()}\0".encode ())
+        return sha.hexdigest ()
+
+    def solverOptions (self):
+        return "; ".join (f"{name}: {member.solverOptions ()}" for name,member in self._members.items ())
+
+    def isInteractive (self):
+        return False
+
+    def setLimits (self,limits):
+        for member in self._members.values ():
+            member.setLimits (limits)
+
+    # run (member,cancel) runs one member; returns the winning result
+    def _race (self,run,name,outer = None):
+        cancel = smtquery.solvers.runner.Cancellation ()
+        if outer != None:
+            outer.register (id (cancel),cancel.cancel)
+        answers = queue.Queue ()
+        def race (membername,member):
+            try:
+                answers.put ((membername,run (member,cancel)))
+            except Exception as e:
+                logging.getLogger ().error (f"Portfolio member {membername} failed on {name}: {e}")
+                answers.put ((membername,VerificationResult (Result.ErrorTermination,0.0,"")))
+        for membername,member in self._members.items ():
+            threading.Thread (target = race,args = (membername,member),daemon = True).start ()
+
+        results = dict()
+        while len(results) < len(self._members):
+            membername,verresult = answers.get ()
+            results[membername] = verresult
+            if verresult.getResult () in [Result.Satisfied,Result.NotSatisfied]:
+                cancel.cancel ()
+                verresult.addStats ({"winner" : membername})
+                return verresult
+        for result in _FALLBACK:
+            for membername,verresult in results.items ():
+                if verresult.getResult () == result:
+                    verresult.addStats ({"winner" : None})
+                    return verresult
+        return VerificationResult (Result.ErrorTermination,0.0,"")
+
+    def runSolver (self,smtfile,timeout = None,store = None,cancel = None):
+        verresult = self._race (lambda member,stop: member.runSolver (smtfile,timeout,cancel = stop),smtfile.getName (),cancel)
+        if store != None:
+            store.storeResult (verresult,smtfile,self,timeout)
+        return verresult
+
+    def runSolverOnText (self,text,timeout = None,cancel = None):
+        return self._race (lambda member,stop: member.runSolverOnText (text,timeout,cancel = stop),"input-text (verification)",cancel)
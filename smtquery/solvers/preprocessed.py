@@ -0,0 +1,125 @@
+import os
+import stat
+import time
+import logging
+import threading
+
+# Preprocessed instances cached on disk. The output of preprocessing depends only on the
+# instance content and the solver's preprocessing, so files are keyed by (preprocessing
+# key,content hash) and shared by all runs, workers and queries of the user. Entries
+# are written under a temporary name and renamed, so readers never see partial files.
+# The directory is set by runParameters: preprocess_cache, false disables the cache; by
+# default it is smtquery/preprocessed in the user's cache directory ($XDG_CACHE_HOME).
+# Solvers run whatever is found there, so the cache is only used if the directory is
+# owned by the user and closed to everyone else (it is created with mode 0700).
+# The cache is bounded by runParameters: preprocess_cache_size (MB); beyond it the least
+# recently used entries are evicted.
+
+CACHE_SIZE = 1024
+# entries used this recently are never evicted, a run may be about to read them
+_IN_USE = 60
+# stores between rescans of the cache size, other processes store as well
+_RESCAN = 100
+
+DEFAULT_DIRECTORY = os.path.join (os.environ.get ("XDG_CACHE_HOME") or os.path.expanduser ("~/.cache"),"smtquery","preprocessed")
+
+_directory = DEFAULT_DIRECTORY
+_limit = CACHE_SIZE * 1024 * 1024
+_checked = None
+_size = None
+_stores = 0
+_lock = threading.Lock ()
+
+def configure (directory = DEFAULT_DIRECTORY,size = CACHE_SIZE):
+    global _directory,_limit,_checked,_size
+    _directory = directory
+    _limit = int (float (size) * 1024 * 1024)
+    _checked = None
+    _size = None
+
+# the cache directory if it is private to the user, None otherwise
+def _cacheDirectory ():
+    global _checked
+    if not _directory:
+        return None
+    if _checked == None:
+        try:
+            os.makedirs (_directory,mode = 0o700,exist_ok = True)
+            st = os.lstat (_directory)
+            _checked = stat.S_ISDIR (st.st_mode) and st.st_uid == os.getuid () and not st.st_mode & 0o077
+        except OSError as e:
+            logging.getLogger ().error (f"Could not create the preprocessing cache {_directory}: {e}")
+            _checked = False
+        if not _checked:
+            logging.getLogger ().error (f"Not using the preprocessing cache {_directory}: it has to be a directory owned by the user and accessible only to them")
+    return _directory if _checked else None
+
+def cachePath (key,content_hash):
+    directory = _cacheDirectory ()
+    if directory == None or content_hash == None:
+        return None
+    return os.path.join (directory,key,f"{content_hash}.smt")
+
+def lookup (key,content_hash):
+    path = cachePath (key,content_hash)
+    if path == None:
+        return None
+    try:
+        # the modification time records the last use
+        os.utime (path)
+    except FileNotFoundError:
+        return None
+    return path
+
+# write (path) creates the preprocessed file; returns the path of the cache entry
+def store (key,content_hash,write):
+    path = cachePath (key,content_hash)
+    os.makedirs (os.path.dirname (path),mode = 0o700,exist_ok = True)
+    partial = f"{path}.{os.getpid ()}-{threading.get_ident ()}"
+    try:
+        write (partial)
+        os.replace (partial,path)
+    finally:
+        if os.path.exists (partial):
+            os.remove (partial)
+    _stored (os.path.getsize (path))
+    return path
+
+def _entries ():
+    for key in os.scandir (_directory):
+        if not key.is_dir (follow_symlinks = False):
+            continue
+        for entry in os.scandir (key.path):
+            if entry.name.endswith (".smt"):
+                try:
+                    st = entry.stat (follow_symlinks = False)
+                except FileNotFoundError:
+                    continue
+                yield entry.path,st.st_size,st.st_mtime
+
+# keeps track of the cache size, the size is rescanned now and then and before evicting
+def _stored (added):
+    global _size,_stores
+    with _lock:
+        _stores += 1
+        if _size == None or _stores % _RESCAN == 0:
+            _size = sum (size for path,size,mtime in _entries ())
+        else:
+            _size += added
+        if _size > _limit:
+            _size = _evict ()
+
+# removes least recently used entries down to 90% of the limit, returns the size left
+def _evict ():
+    entries = sorted (_entries (),key = lambda e: e[2])
+    size = sum (size for path,size,mtime in entries)
+    now = time.time ()
+    for path,entrysize,mtime in entries:
+        if size <= _limit * 0.9 or now - mtime < _IN_USE:
+            break
+        try:
+            os.remove (path)
+        except FileNotFoundError:
+            pass
+        size -= entrysize
+    return size
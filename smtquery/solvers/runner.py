@@ -0,0 +1,171 @@
+import os
+import time
+import signal
+import resource
+import threading
+import subprocess
+
+# Runs one solver process and accounts for its resources. The child is reaped with
+# os.wait4, so its user/system CPU time and peak RSS are those of the solver alone;
+# wall time covers process start to exit. A watchdog kills the child at the deadline.
+# Optional per-solver limits: memory (MB, RLIMIT_AS), cpu (seconds, RLIMIT_CPU) and
+# output (MB of stdout kept, the model is dropped beyond it).
+#
+# The solver runs in its own session, so it leads a process group: on the deadline and
+# once the solver has exited the whole group is killed, wrappers and helper processes
+# the solver started included. stdout and stderr are drained while the solver runs;
+# stdout is kept up to the output limit and only the tail of stderr is kept.
+
+OUTPUT_LIMIT = 64
+STDERR_TAIL = 4096
+_CHUNK = 65536
+
+# Stops runs on request, e.g. the losing members of a portfolio. Runs register a stop
+# function while they are running; a run registering after cancel is stopped at once.
+class Cancellation:
+    def __init__ (self):
+        self._lock = threading.Lock ()
+        self._stops = dict()
+        self._cancelled = False
+
+    def register (self,key,stop):
+        with self._lock:
+            if self._cancelled:
+                stop ()
+            else:
+                self._stops[key] = stop
+
+    def unregister (self,key):
+        with self._lock:
+            self._stops.pop (key,None)
+
+    def cancel (self):
+        with self._lock:
+            self._cancelled = True
+            for stop in self._stops.values ():
+                stop ()
+            self._stops.clear ()
+
+    def isCancelled (self):
+        return self._cancelled
+
+class ProcessRun:
+    def __init__ (self,stdout,returncode,wall,cpu_user,cpu_sys,max_rss,timed_out,stderr = b"",truncated = False,cancelled = False):
+        self.stdout = stdout
+        self.returncode = returncode
+        self.wall = wall
+        self.cpu_user = cpu_user
+        self.cpu_sys = cpu_sys
+        self.max_rss = max_rss
+        self.timed_out = timed_out
+        self.stderr = stderr
+        self.truncated = truncated
+        self.cancelled = cancelled
+
+    # RLIMIT_CPU is enforced with SIGXCPU, which counts as running out of time
+    def outOfTime (self):
+        return self.timed_out or self.returncode == -signal.SIGXCPU
+
+    # number of the signal that terminated the solver, None if it exited
+    def exitSignal (self):
+        return -self.returncode if self.returncode < 0 else None
+
+    def stats (self):
+        return {"wall_time" : self.wall,
+                "cpu_user" : self.cpu_user,
+                "cpu_sys" : self.cpu_sys,
+                "max_rss" : self.max_rss,
+                "exit_signal" : self.exitSignal (),
+                "stderr_tail" : self.stderr.decode (errors = "replace") or None,
+                "output_truncated" : self.truncated}
+
+# limits are set on the running child with prlimit: a preexec_fn is not safe in a
+# process with threads, and the runs of a portfolio are started from threads
+def _applyLimits (pid,limits):
+    try:
+        if limits.get ("memory"):
+            size = int (limits["memory"]) * 1024 * 1024
+            resource.prlimit (pid,resource.RLIMIT_AS,(size,size))
+        if limits.get ("cpu"):
+            seconds = int (limits["cpu"])
+            resource.prlimit (pid,resource.RLIMIT_CPU,(seconds,seconds + 1))
+    except ProcessLookupError:
+        # already exited
+        pass
+
+def killGroup (pgid):
+    try:
+        os.killpg (pgid,signal.SIGKILL)
+    except (ProcessLookupError,PermissionError):
+        pass
+
+class _Drain (threading.Thread):
+    def __init__ (self,stream,limit,tail = False):
+        super().__init__ (daemon = True)
+        self._stream = stream
+        self._limit = limit
+        self._tail = tail
+        self._chunks = []
+        self._size = 0
+        self.truncated = False
+
+    def run (self):
+        with self._stream:
+            for chunk in iter (lambda: self._stream.read1 (_CHUNK),b""):
+                if self._tail:
+                    self._chunks.append (chunk)
+                    self._size += len(chunk)
+                    while self._size - len(self._chunks[0]) >= self._limit:
+                        self._size -= len(self._chunks.pop (0))
+                elif self._size < self._limit:
+                    chunk = chunk[:self._limit - self._size]
+                    self._chunks.append (chunk)
+                    self._size += len(chunk)
+                else:
+                    # keep reading so the solver never blocks on a full pipe
+                    self.truncated = True
+
+    def data (self):
+        data = b"".join (self._chunks)
+        return data[-self._limit:] if self._tail else data
+
+def run (cmd,timeout = None,limits = None,cancel = None):
+    limits = limits or dict()
+    start = time.perf_counter ()
+    proc = subprocess.Popen (cmd,
+                             stdout = subprocess.PIPE,
+                             stderr = subprocess.PIPE,
+                             start_new_session = True)
+    _applyLimits (proc.pid,limits)
+    out = _Drain (proc.stdout,int (float (limits.get ("output",OUTPUT_LIMIT)) * 1024 * 1024))
+    err = _Drain (proc.stderr,STDERR_TAIL,tail = True)
+    out.start ()
+    err.start ()
+    if cancel != None:
+        cancel.register (proc.pid,lambda: killGroup (proc.pid))
+
+    expired = threading.Event ()
+    def watchdog ():
+        expired.set ()
+        killGroup (proc.pid)
+    timer = threading.Timer (timeout,watchdog) if timeout != None else None
+    if timer != None:
+        timer.start ()
+    try:
+        # wait without reaping: while the solver is a zombie its group id cannot be reused
+        os.waitid (os.P_PID,proc.pid,os.WEXITED | os.WNOWAIT)
+    finally:
+        if timer != None:
+            timer.cancel ()
+        if cancel != None:
+            cancel.unregister (proc.pid)
+        killGroup (proc.pid)
+        pid,status,usage = os.wait4 (proc.pid,0)
+    wall = time.perf_counter () - start
+    # reaped by wait4, Popen must not wait for it again
+    proc.returncode = os.waitstatus_to_exitcode (status)
+    out.join ()
+    err.join ()
+    cancelled = cancel != None and cancel.isCancelled () and proc.returncode == -signal.SIGKILL
+    return ProcessRun (out.data (),proc.returncode,wall,usage.ru_utime,usage.ru_stime,usage.ru_maxrss,expired.is_set (),
+                       err.data (),out.truncated,cancelled)
@@ -1,11 +1,15 @@
 import enum
+import statistics
 import subprocess
 import time
-import tempfile
 import shutil
 import os
 import logging
 import hashlib
+import smtquery.solvers.staging
+import smtquery.solvers.preprocessed
+import smtquery.solvers.interactive
+import smtquery.solvers.runner
 
 class Timer:
     def __enter__ (self):
@@ -40,6 +44,7 @@ class VerificationResult:
         self._result = result
         self._time_in_seconds = time_in_seconds
         self._model = model
+        self._stats = dict()
 
     def getResult (self):
         return self._result
@@ -50,22 +55,101 @@ class VerificationResult:
     def getModel (self):
         return self._model
 
+    # resource accounting of the run: wall_time, cpu_user, cpu_sys, max_rss,
+    # queue_wait, staging_time, preprocess_time, and how the solver process ended:
+    # exit_signal, stderr_tail, output_truncated, the winner of a portfolio and
+    # repetitions, time_dispersion, noisy of benchmark runs; keys are missing if not measured
+    def getStats (self):
+        return self._stats
+
+    def addStats (self,stats):
+        self._stats.update (stats)
+
     def __str__ (self):
         return f"{self._result.name} in {self._time_in_seconds} seconds" 
+
+# times of stored results compared with each other: CPU time with compare "cpu" if it was
+# measured for all of them, the recorded wall clock time of all otherwise, so CPU time is
+# never compared with wall time (interactive, portfolio and repeated runs may lack it)
+def measuredTimes (results,compare = "wall"):
+    if compare == "cpu" and all (result.get ("cpu_time") != None for result in results):
+        return [result["cpu_time"] for result in results]
+    return [result["time"] for result in results]
+
+# runs a solver repeatedly on one instance for benchmarking. The run with the median time
+# is the result, with the median time of all runs and their dispersion: the median absolute
+# deviation relative to the median. Results too dispersed to rank, or with answers differing
+# between runs, are flagged noisy.
+def runRepeated (solver,smtfile,timeout,repetitions,max_dispersion = 0.1):
+    runs = sorted ((solver.runSolver (smtfile,timeout) for _ in range (repetitions)),key = lambda r: r.getTime ())
+    median = statistics.median (r.getTime () for r in runs)
+    dispersion = statistics.median (abs (r.getTime () - median) for r in runs) / median if median > 0 else 0.0
+    chosen = runs[(len(runs) - 1) // 2]
+    verresult = VerificationResult (chosen.getResult (),median,chosen.getModel ())
+    verresult.addStats (chosen.getStats ())
+    verresult.addStats ({"repetitions" : len(runs),
+                         "time_dispersion" : dispersion,
+                         "noisy" : dispersion > max_dispersion or len({r.getResult () for r in runs}) > 1})
+    return verresult
+
+# (error "...") responses in the output of a solver
+def _errors (stdout):
+    return [line.strip () for line in stdout.splitlines () if line.lstrip ().startswith ("(error")]
     
 class Solver:
+    PREPROCESS_VERSION = 1
+
     def __init__(self,command):
         self._command = command
+        self._solver_version = None
+        self._solver_hash = None
+        self._interactive = False
+        self._limits = None
 
     def getVersion (self) -> str:
         return "0.0"
 
+    # first line of getVersion, recorded with every result; computed once per solver object
+    def solverVersion (self):
+        if self._solver_version == None:
+            try:
+                version = self.getVersion ()
+                if isinstance (version,bytes):
+                    version = version.decode ()
+                self._solver_version = (version.strip ().splitlines () or [""])[0]
+            except (OSError,subprocess.CalledProcessError) as e:
+                logging.getLogger ().error (f"Could not determine the version of {self.getName ()}: {e}")
+                self._solver_version = ""
+        return self._solver_version
+
     def getName (self) -> str:
         return "Dummy"
 
     def calcHash (self):
         with open(self._command,'br') as ff:
             return hashlib.sha256 (ff.read()).hexdigest ()
+
+    # hash of the solver binary, recorded with every result; computed once per solver object
+    def solverHash (self):
+        if self._solver_hash == None:
+            try:
+                self._solver_hash = self.calcHash ()
+            except OSError as e:
+                logging.getLogger ().error (f"Could not hash the binary of {self.getName ()}: {e}")
+                self._solver_hash = ""
+        return self._solver_hash
+
+    # command line options the solver is run with, the binary and the instance left out
+    def commandOptions (self):
+        return " ".join (self.buildCMDList ("{instance}")[1:])
+
+    # recorded with every result and part of the key of cached results: the command line
+    # options and the configured limits, a result obtained under other limits is not reused
+    def solverOptions (self):
+        limits = sorted ((key,value) for key,value in (self._limits or dict()).items () if value != None)
+        if not limits:
+            return self.commandOptions ()
+        return self.commandOptions () + " limits: " + " ".join (f"{key}={value}" for key,value in limits)
     
     def preprocessSMTFile  (self, origsmt, newsmt):
         shutil.copy(origsmt,newsmt)
@@ -80,62 +164,100 @@ class Solver:
         
     def buildCMDList (self,smtfilepath):
         return ["echo", smtfilepath]
+
+    # command line of a long-lived process reading SMT-LIB from stdin, None if unsupported
+    def buildInteractiveCMDList (self):
+        return None
+
+    # limits of one-shot runs: {"memory" : MB, "cpu" : seconds, "output" : MB}
+    def setLimits (self,limits):
+        self._limits = limits
+
+    def setInteractive (self,interactive):
+        self._interactive = interactive
+
+    def isInteractive (self):
+        return self._interactive and self.buildInteractiveCMDList () != None
+
+    def _runInteractive (self,text,timeout,name):
+        stdout,elapsed,status = smtquery.solvers.interactive.process (self.buildInteractiveCMDList ()).run (text,timeout)
+        if status == "timeout":
+            verresult = VerificationResult (Result.TimeOut,elapsed,"")
+        elif status == "crashed":
+            logging.getLogger ().error (f"Solver {self.getName() } terminated unexpectedly on {name}")
+            verresult = VerificationResult (Result.ErrorTermination,elapsed,"")
+        elif _errors (stdout):
+            # a one-shot run exits with an error code here, the interactive process keeps going
+            logging.getLogger ().error (f"Solver {self.getName() } reported errors on {name}: {' '.join (_errors (stdout))}")
+            verresult = VerificationResult (Result.ErrorTermination,elapsed,"")
+        else:
+            verresult = self.postprocess (None,stdout,elapsed)
+        # the process outlives the job, its CPU time and RSS cannot be attributed to it
+        verresult.addStats ({"wall_time" : elapsed})
+        return verresult
     
-    def _runSolverBackend(self,usepath,timeout):
-        verresult = None
-        timer = Timer ()
-        try:
-            with timer:
-                stdout = subprocess.check_output ( self.buildCMDList (usepath),timeout = timeout)
-        except subprocess.CalledProcessError as cer:
-            logging.getLogger ().error (f"Solver {self.getName() } returned non-zero exit code for {smtpath}")
-            verresult = VerificationResult (Result.ErrorTermination,timer.getElapsed(),"")
-        except subprocess.TimeoutExpired:
-            verresult = VerificationResult (Result.TimeOut,timer.getElapsed(),"")
-        if verresult == None:
-            verresult =  self.postprocess (tmpdir,stdout.decode(),timer.getElapsed ())
+    def _runSolverBackend(self,usepath,timeout,name,cancel = None):
+        run = smtquery.solvers.runner.run (self.buildCMDList (usepath),timeout,self._limits,cancel)
+        if run.outOfTime ():
+            verresult = VerificationResult (Result.TimeOut,run.wall,"")
+        elif run.cancelled:
+            verresult = VerificationResult (Result.Unknown,run.wall,"")
+        elif run.returncode != 0:
+            reason = f"signal {run.exitSignal ()}" if run.exitSignal () != None else f"non-zero exit code {run.returncode}"
+            logging.getLogger ().error (f"Solver {self.getName() } terminated with {reason} for {name}: {run.stats ()['stderr_tail']}")
+            verresult = VerificationResult (Result.ErrorTermination,run.wall,"")
+        else:
+            verresult =  self.postprocess (os.path.dirname (usepath),run.stdout.decode(errors = "replace"),run.wall)
+            if run.truncated:
+                # the answer is kept, the cut off model is useless
+                logging.getLogger ().warning (f"Output of solver {self.getName() } for {name} exceeds the output limit, model dropped")
+                verresult = VerificationResult (verresult.getResult (),verresult.getTime (),"")
+        verresult.addStats (run.stats ())
         return verresult
 
 
-    def runSolver (self,smtfile,timeout = None,store = None)->VerificationResult:
-        verresult = None
-        with tempfile.TemporaryDirectory () as tmpdir:
-            usepath = os.path.join (tmpdir,"input.smt")
-            smtpath = smtfile.copyOutSMTFile (tmpdir)
-            self.preprocessSMTFile (smtpath,usepath)
-            
-            timer = Timer ()
-            try:
-                with timer:
-                    stdout = subprocess.check_output ( self.buildCMDList (usepath),timeout = timeout)
-            except subprocess.CalledProcessError as cer:
-                logging.getLogger ().error (f"Solver {self.getName() } returned non-zero exit code for {smtpath}")
-                verresult = VerificationResult (Result.ErrorTermination,timer.getElapsed(),"")
-            except subprocess.TimeoutExpired:
-                verresult = VerificationResult (Result.TimeOut,timer.getElapsed(),"")
-            if verresult == None:
-                verresult =  self.postprocess (tmpdir,stdout.decode(),timer.getElapsed ())
-            if store != None:
-                print ("Store result")
-                store.storeResult (verresult,smtfile,self)
-            return verresult
-
-    def runSolverOnText(self,text,timeout = None):
-        verresult = None
-        with tempfile.TemporaryDirectory () as tmpdir:
-            usepath = os.path.join (tmpdir,"input.smt")
-            with open(usepath, 'w') as f:
-                f.write(text)
-            
-            timer = Timer ()
-            try:
-                with timer:
-                    stdout = subprocess.check_output ( self.buildCMDList (usepath),timeout = timeout)
-            except subprocess.CalledProcessError as cer:
-                logging.getLogger ().error (f"Solver {self.getName() } returned non-zero exit code for input-textfile (verification)!")
-                verresult = VerificationResult (Result.ErrorTermination,timer.getElapsed(),"")
-            except subprocess.TimeoutExpired:
-                verresult = VerificationResult (Result.TimeOut,timer.getElapsed(),"")
-            if verresult == None:
-                verresult =  self.postprocess (tmpdir,stdout.decode(),timer.getElapsed ())
-            return verresult
+    # identifies the preprocessing of this solver, bump PREPROCESS_VERSION when preprocessSMTFile changes
+    def preprocessKey (self):
+        return f"{type (self).__name__}-{self.PREPROCESS_VERSION}"
+
+    # the preprocessed instance, staged and preprocessed only on a cache miss
+    def _preparedPath (self,smtfile,timer):
+        key = self.preprocessKey ()
+        content_hash = smtfile.hashContent ()
+        usepath = smtquery.solvers.preprocessed.lookup (key,content_hash)
+        if usepath != None:
+            return usepath,0.0,0.0
+
+        with timer:
+            localpath = smtfile.localPath ()
+        staging = timer.getElapsed ()
+        with timer:
+            if smtquery.solvers.preprocessed.cachePath (key,content_hash) != None:
+                usepath = smtquery.solvers.preprocessed.store (key,content_hash,lambda path: self.preprocessSMTFile (localpath,path))
+            else:
+                usepath = smtquery.solvers.staging.stagingPath (f"{self.getName ()}.smt")
+                self.preprocessSMTFile (localpath,usepath)
+        return usepath,staging,timer.getElapsed ()
+
+    # cancel stops the run early, cancellable runs do not use the interactive process
+    def runSolver (self,smtfile,timeout = None,store = None,cancel = None)->VerificationResult:
+        usepath,staging,preprocessing = self._preparedPath (smtfile,Timer ())
+        
+        if self.isInteractive () and cancel == None:
+            with open (usepath,'r') as ff:
+                verresult = self._runInteractive (ff.read (),timeout,smtfile.getName ())
+        else:
+            verresult = self._runSolverBackend (usepath,timeout,smtfile.getName (),cancel)
+        verresult.addStats ({"staging_time" : staging, "preprocess_time" : preprocessing})
+        if store != None:
+            print ("Store result")
+            store.storeResult (verresult,smtfile,self,timeout)
+        return verresult
+
+    def runSolverOnText(self,text,timeout = None,cancel = None):
+        if self.isInteractive () and cancel == None:
+            return self._runInteractive (text,timeout,"input-text (verification)")
+        usepath = smtquery.solvers.staging.stagingPath (f"{self.getName ()}-text.smt")
+        with open(usepath, 'w') as f:
+            f.write(text)
+        return self._runSolverBackend (usepath,timeout,"input-text (verification)",cancel)
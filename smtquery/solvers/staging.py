@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing.util
+
+# Per-process scratch area for solver input. Instances are preprocessed straight from
+# their source path into a file that is reused by every run of the same solver in the
+# same worker (and thread), so a run writes exactly one file and copies nothing.
+# The scratch area lives on tmpfs (/dev/shm) whenever it is available.
+#
+# Pool workers end with os._exit and may be terminated, so they never run atexit
+# handlers. The scratch tree is therefore created by the parent before it starts its
+# workers (see smtquery.scheduling.multi.Queue) and removed when the parent exits; the
+# workers' directories are below it. Directories are also removed by multiprocessing
+# finalizers, which run when a worker exits normally.
+
+_tree = None
+_scratch = None
+_scratch_pid = None
+
+def scratchRoot ():
+    if os.path.isdir ("/dev/shm") and os.access ("/dev/shm",os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir ()
+
+def _removeLater (path):
+    multiprocessing.util.Finalize (None,shutil.rmtree,args = (path,True),exitpriority = 0)
+
+# created once per process tree, forked workers inherit it
+def scratchTree ():
+    global _tree
+    if _tree == None or not os.path.isdir (_tree):
+        _tree = tempfile.mkdtemp (prefix = f"smtquery-{os.getpid ()}-",dir = scratchRoot ())
+        _removeLater (_tree)
+    return _tree
+
+def scratchDirectory ():
+    global _scratch,_scratch_pid
+    if _scratch_pid != os.getpid () or not os.path.isdir (_scratch):
+        _scratch = os.path.join (scratchTree (),str (os.getpid ()))
+        os.makedirs (_scratch,exist_ok = True)
+        _scratch_pid = os.getpid ()
+        _removeLater (_scratch)
+    return _scratch
+
+def stagingPath (name):
+    return os.path.join (scratchDirectory (),f"{threading.get_ident ()}-{name}")
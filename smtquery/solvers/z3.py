@@ -1,7 +1,13 @@
 import smtquery.solvers.solver as solver
 import subprocess
+import re
+
+# lines requesting a model, the model is dumped anyway
+_GETMODEL = re.compile (r"^.*\(get-model.*(?:\n|$)",re.MULTILINE)
 
 class Z3(solver.Solver):
+    PREPROCESS_VERSION = 2
+
     def __init__(self,binarypath,variation = "Str3",stringsolver="z3str3"):
         super().__init__(binarypath)
         self._path = binarypath
@@ -16,12 +22,13 @@ class Z3(solver.Solver):
     
     def preprocessSMTFile  (self, origsmt, newsmt):
         with open(origsmt,'r') as orig, open(newsmt,'w') as new:
-            for l in orig:
-                if "(get-model" not in l:
-                    new.write (l)
+            new.write (_GETMODEL.sub ("",orig.read ()))
 
     def buildCMDList (self,smtfilepath):
         return [self._path,f"smt.string_solver={self._stringsolver}","dump_models=true",smtfilepath]
 
+    def buildInteractiveCMDList (self):
+        return [self._path,f"smt.string_solver={self._stringsolver}","dump_models=true","-in"]
+
 
 
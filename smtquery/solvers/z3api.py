@@ -0,0 +1,94 @@
+import hashlib
+import resource
+import logging
+import z3
+from smtquery.solvers.z3 import Z3
+from smtquery.solvers.solver import Result,VerificationResult,Timer
+
+# Z3 run inside the worker process through the z3 Python API: no process is spawned, no
+# file is written and no output is parsed. Every job gets a fresh context, so nothing
+# leaks from one instance into the next.
+# The run is not isolated from the worker: a crash of z3 takes the worker down and the run
+# is lost. Limits are left to z3: the memory limit is z3's memory_max_size (for the whole
+# process, so a runaway allocation fails instead of exhausting the worker) and max_memory
+# of the solver; the cpu limit bounds the timeout, the run is in this thread.
+
+class Z3API(Z3):
+    def getVersion (self):
+        return f"Z3 version {z3.get_version_string ()} (API)"
+
+    # the library build identifies the solver, the configured binary is not used
+    def calcHash (self):
+        return hashlib.sha256 (z3.get_full_version ().encode ()).hexdigest ()
+
+    def commandOptions (self):
+        return f"api smt.string_solver={self._stringsolver}"
+
+    def isInteractive (self):
+        return False
+
+    def _solve (self,parse,timeout,name,cancel = None):
+        before = resource.getrusage (resource.RUSAGE_THREAD)
+        verresult = self._check (parse,timeout,name,cancel)
+        after = resource.getrusage (resource.RUSAGE_THREAD)
+        # in process, the solver's CPU time is that of this thread
+        verresult.addStats ({"wall_time" : verresult.getTime (),
+                             "cpu_user" : after.ru_utime - before.ru_utime,
+                             "cpu_sys" : after.ru_stime - before.ru_stime})
+        return verresult
+
+    def _check (self,parse,timeout,name,cancel = None):
+        ctx = z3.Context ()
+        timer = Timer ()
+        if cancel != None:
+            cancel.register (id (ctx),ctx.interrupt)
+        try:
+            limits = self._limits or dict()
+            memory = int (limits["memory"]) if limits.get ("memory") else 0
+            if limits.get ("cpu"):
+                timeout = min (timeout,float (limits["cpu"])) if timeout != None else float (limits["cpu"])
+            with timer:
+                # 0 is unlimited, the setting is global and reset for runs without a limit
+                z3.set_param ("memory_max_size",memory)
+                solver = z3.Solver (ctx = ctx)
+                solver.set ("smt.string_solver",self._stringsolver)
+                if memory:
+                    solver.set ("max_memory",memory)
+                if timeout != None:
+                    solver.set ("timeout",int (timeout * 1000))
+                solver.add (parse (ctx))
+                answer = solver.check ()
+        except z3.Z3Exception as e:
+            logging.getLogger ().error (f"Solver {self.getName ()} failed on {name}: {e}")
+            return VerificationResult (Result.ErrorTermination,timer.getElapsed (),"")
+        finally:
+            if cancel != None:
+                cancel.unregister (id (ctx))
+
+        if answer == z3.sat:
+            return VerificationResult (Result.Satisfied,timer.getElapsed (),f"(\n{solver.model ().sexpr ()}\n)")
+        if answer == z3.unsat:
+            return VerificationResult (Result.NotSatisfied,timer.getElapsed (),"")
+        if cancel != None and cancel.isCancelled ():
+            return VerificationResult (Result.Unknown,timer.getElapsed (),"")
+        if solver.reason_unknown () in ("timeout","canceled"):
+            return VerificationResult (Result.TimeOut,timer.getElapsed (),"")
+        if "memory" in solver.reason_unknown ():
+            # as a one-shot run failing on its memory limit
+            logging.getLogger ().error (f"Solver {self.getName ()} ran out of memory on {name}: {solver.reason_unknown ()}")
+            return VerificationResult (Result.ErrorTermination,timer.getElapsed (),"")
+        return VerificationResult (Result.Unknown,timer.getElapsed (),"")
+
+    def runSolver (self,smtfile,timeout = None,store = None,cancel = None):
+        if smtfile.isPlainFile ():
+            parse = lambda ctx: z3.parse_smt2_file (smtfile.getPath (),ctx = ctx)
+        else:
+            text = smtfile.SMTString ()
+            parse = lambda ctx: z3.parse_smt2_string (text,ctx = ctx)
+        verresult = self._solve (parse,timeout,smtfile.getName (),cancel)
+        if store != None:
+            store.storeResult (verresult,smtfile,self,timeout)
+        return verresult
+
+    def runSolverOnText (self,text,timeout = None,cancel = None):
+        return self._solve (lambda ctx: z3.parse_smt2_string (text,ctx = ctx),timeout,"input-text (verification)",cancel)
@@ -0,0 +1,125 @@
+import os
+import io
+import bz2
+import gzip
+import lzma
+import time
+import tarfile
+import zipfile
+import threading
+
+# Instances may live in benchmark bundles (.tar, .tar.gz, .tar.xz, .tar.bz2, .zip) or be
+# compressed individually (.smt2.gz, .smt2.xz, .smt2.bz2). Nothing is extracted to disk:
+# an archive is indexed once per process and members are decompressed on demand.
+# Archive members are addressed as "<archive path>!/<member name>".
+
+MEMBER_SEPARATOR = "!/"
+ARCHIVE_SUFFIXES = (".tar.gz",".tgz",".tar.xz",".txz",".tar.bz2",".tbz2",".tar",".zip")
+COMPRESSED_SUFFIXES = {".gz" : gzip.open,
+                       ".xz" : lzma.open,
+                       ".bz2" : bz2.open}
+
+def isArchive (name):
+    return name.endswith (ARCHIVE_SUFFIXES)
+
+def archiveStem (name):
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith (suffix):
+            return name[:-len(suffix)]
+    return name
+
+def stripCompression (name):
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith (suffix):
+            return name[:-len(suffix)]
+    return name
+
+def memberPath (archivepath,member):
+    return f"{archivepath}{MEMBER_SEPARATOR}{member}"
+
+def splitMemberPath (path):
+    return path.split (MEMBER_SEPARATOR,1)
+
+def isMemberPath (path):
+    return MEMBER_SEPARATOR in path
+
+# plain files can be handed to solvers and parsers as they are
+def isPlainPath (path):
+    return not isMemberPath (path) and stripCompression (path) == path
+
+def exists (path):
+    if isMemberPath (path):
+        return os.path.isfile (splitMemberPath (path)[0])
+    return os.path.exists (path)
+
+class ArchiveIndex:
+    def __init__ (self,path):
+        self._path = path
+        self._lock = threading.Lock ()
+        self._members = dict()
+        if path.endswith (".zip"):
+            self._handle = zipfile.ZipFile (path)
+            for info in self._handle.infolist ():
+                if not info.is_dir ():
+                    self._members[info.filename] = (info,info.file_size,time.mktime (info.date_time + (0,0,-1)))
+        else:
+            self._handle = tarfile.open (path,"r:*")
+            for info in self._handle.getmembers ():
+                if info.isfile ():
+                    self._members[info.name] = (info,info.size,float (info.mtime))
+
+    # (member name,size,mtime) for every regular file in the archive
+    def members (self):
+        for name,(info,size,mtime) in self._members.items ():
+            yield name,size,mtime
+
+    # random access: the tar is opened once with "r:*", so for a compressed tar every read
+    # decompresses from the start of the archive up to the member, O(archive) per member;
+    # use stream to visit many members
+    def read (self,member):
+        info = self._members[member][0]
+        with self._lock:
+            if isinstance (self._handle,zipfile.ZipFile):
+                return self._handle.read (info)
+            return self._handle.extractfile (info).read ()
+
+    # (member name,binary file object) for every regular file in archive order, in a
+    # single pass over a separately opened archive; a file object is only valid until
+    # the next member is yielded
+    def stream (self):
+        if isinstance (self._handle,zipfile.ZipFile):
+            for name in self._members:
+                yield name,io.BytesIO (self.read (name))
+            return
+        with tarfile.open (self._path,"r|*") as tar:
+            for info in tar:
+                if info.isfile ():
+                    yield info.name,tar.extractfile (info)
+
+_indexes = dict()
+_indexes_lock = threading.Lock ()
+
+def archiveIndex (path):
+    key = (os.getpid (),path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = ArchiveIndex (path)
+        return _indexes[key]
+
+# binary file object ff of an instance named name, decompressed if the instance is
+# compressed individually (members of bundles may be as well)
+def decompressed (name,ff):
+    for suffix,opener in COMPRESSED_SUFFIXES.items ():
+        if name.endswith (suffix):
+            return opener (ff,'rb')
+    return ff
+
+# binary file object with the (decompressed) content of an instance
+def openInstance (path):
+    if isMemberPath (path):
+        archivepath,member = splitMemberPath (path)
+        return decompressed (member,io.BytesIO (archiveIndex (archivepath).read (member)))
+    for suffix,opener in COMPRESSED_SUFFIXES.items ():
+        if path.endswith (suffix):
+            return opener (path,'rb')
+    return open (path,'rb')
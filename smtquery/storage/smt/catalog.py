@@ -0,0 +1,75 @@
+import time
+import sqlalchemy
+
+# Per-process in-memory copy of the instance catalog: benchmark, track and instance names
+# resolve to ids and paths without touching the database. initdb and allocateNew bump the
+# catalog version stored in the database; a cached catalog is reloaded once it sees a newer
+# version, which is checked at most every check_interval seconds.
+
+class Catalog:
+    def __init__ (self,version,benchmarks,tracks,instances):
+        self._version = version
+        # name -> id
+        self._benchmarks = benchmarks
+        # name -> (id,bench_id)
+        self._tracks = tracks
+        # name -> (id,path,content_hash,track_id)
+        self._instances = instances
+        self._byid = {entry[0] : name for name,entry in instances.items ()}
+
+    def getVersion (self):
+        return self._version
+
+    def benchmarkId (self,name):
+        return self._benchmarks.get (name)
+
+    def track (self,name):
+        return self._tracks.get (name)
+
+    def instance (self,name):
+        return self._instances.get (name)
+
+    def instanceName (self,id):
+        return self._byid.get (id)
+
+    def instanceIds (self,names):
+        return {name : self._instances[name][0] for name in names if name in self._instances}
+
+def readVersion (conn,version_table):
+    row = conn.execute (sqlalchemy.select (version_table.c.version)).first ()
+    return row.version if row != None else 0
+
+def bumpVersion (conn,version_table):
+    if conn.execute (version_table.update ().values (version = version_table.c.version + 1)).rowcount == 0:
+        conn.execute (version_table.insert ().values (version = 1))
+
+def loadCatalog (conn,version_table,benchmark_table,tracks_table,instance_table):
+    version = readVersion (conn,version_table)
+    benchmarks = {row.name : row.id for row in conn.execute (sqlalchemy.select (benchmark_table.c.name,benchmark_table.c.id))}
+    tracks = {row.name : (row.id,row.bench_id) for row in conn.execute (sqlalchemy.select (tracks_table.c.name,tracks_table.c.id,tracks_table.c.bench_id))}
+    instances = {row.name : (row.id,row.path,row.content_hash,row.track_id)
+                 for row in conn.execute (sqlalchemy.select (instance_table.c.name,instance_table.c.id,instance_table.c.path,
+                                                             instance_table.c.content_hash,instance_table.c.track_id)
+                                          .where (sqlalchemy.not_ (instance_table.c.retired)))}
+    return Catalog (version,benchmarks,tracks,instances)
+
+class CatalogCache:
+    def __init__ (self,engine,tables,check_interval = 5):
+        self._engine = engine
+        self._tables = tables
+        self._check_interval = check_interval
+        self._catalog = None
+        self._checked = 0
+
+    def invalidate (self):
+        self._catalog = None
+
+    def get (self):
+        now = time.monotonic ()
+        if self._catalog != None and now - self._checked < self._check_interval:
+            return self._catalog
+        with self._engine.connect () as conn:
+            if self._catalog == None or readVersion (conn,self._tables[0]) != self._catalog.getVersion ():
+                self._catalog = loadCatalog (conn,*self._tables)
+        self._checked = now
+        return self._catalog
@@ -0,0 +1,32 @@
+import os
+import functools
+import sqlalchemy
+
+# Engine setup shared by the DBFS storage. Connections are pooled by the engine and always
+# used as context managers (engine.connect () for reads, engine.begin () for writes), so they
+# are returned to the pool as soon as a query is done.
+#
+# SQLite runs in WAL mode: readers (qlang) never block the single writer (updateResults,
+# pool callbacks, celery workers), and writers wait up to busy_timeout instead of failing
+# with "database is locked".
+
+def _setSQLitePragmas (busy_timeout,dbapi_connection,connection_record):
+    cursor = dbapi_connection.cursor ()
+    cursor.execute ("PRAGMA journal_mode=WAL")
+    cursor.execute (f"PRAGMA busy_timeout={int(busy_timeout)}")
+    cursor.execute ("PRAGMA synchronous=NORMAL")
+    cursor.execute ("PRAGMA temp_store=MEMORY")
+    cursor.close ()
+
+def createEngine (enginestring,busy_timeout = 30000,pool_size = 5):
+    url = sqlalchemy.engine.make_url (enginestring)
+    if url.get_backend_name () == "sqlite":
+        engine = sqlalchemy.create_engine (url,connect_args = {"timeout" : busy_timeout / 1000})
+        sqlalchemy.event.listen (engine,"connect",functools.partial (_setSQLitePragmas,busy_timeout))
+    else:
+        engine = sqlalchemy.create_engine (url,pool_size = pool_size,pool_pre_ping = True)
+
+    # pooled connections must not be shared with forked pool workers
+    if hasattr (os,"register_at_fork"):
+        os.register_at_fork (after_in_child = functools.partial (engine.dispose,close = False))
+    return engine
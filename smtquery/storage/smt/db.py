@@ -1,38 +1,100 @@
 import os
+import gzip
+import json
 import shutil
 import sqlalchemy
 import datetime
+import time
 import smtquery.solvers.solver
-import hashlib
 import smtquery.config
 import smtquery.ui
 import smtquery.intel
+import smtquery.storage.smt.scan
+import smtquery.storage.smt.archive
+import smtquery.solvers.staging
+import smtquery.storage.smt.migrations
+import smtquery.storage.smt.connection
+import smtquery.storage.smt.writer
+import smtquery.storage.smt.catalog
+import smtquery.storage.smt.latest
+import smtquery.storage.smt.models
     
 
+# splits long IN (...) lists, SQLite limits the number of bound parameters per statement
+def _chunks (values,size = 500):
+    values = list(values)
+    for i in range (0,len(values),size):
+        yield values[i:i+size]
+
+# keyset pagination: rows of query in key order, fetched page by page so nothing but the
+# current page is held in memory and no connection stays open while rows are consumed
+def _pages (engine,query,key,pagesize = 1000):
+    last = None
+    while True:
+        page = query if last == None else query.where (key > last)
+        with engine.connect () as conn:
+            rows = conn.execute (page.order_by (key).limit (pagesize)).fetchall ()
+        yield from rows
+        if len(rows) < pagesize:
+            return
+        last = getattr (rows[-1],key.name)
+
+def _archiveTable (name,meta,table):
+    return sqlalchemy.Table (name,meta,
+                             *[sqlalchemy.Column (c.name,c.type,primary_key = c.primary_key,autoincrement = False) for c in table.columns],
+                             sqlalchemy.Column ('archived',sqlalchemy.DateTime))
+
 class SMTFile:
-    def __init__(self,name,filepath,id):
-        assert (os.path.exists(filepath))
+    def __init__(self,name,filepath,id,content_hash = None):
+        assert (smtquery.storage.smt.archive.exists(filepath))
         self._name = name
         self._filepath = filepath
         self._id = id
+        self._content_hash = content_hash
         
     def __reduce__ (self):
-        return SMTFile,(self._name,self._filepath,self._id)
+        return SMTFile,(self._name,self._filepath,self._id,self._content_hash)
         
+    # instances may be plain files, compressed files or archive members
+    def open (self):
+        return smtquery.storage.smt.archive.openInstance (self._filepath)
+
     def SMTString (self):
-        with open(self._filepath,'r') as ff:
-            return ff.read ()
+        with self.open () as ff:
+            return ff.read ().decode ()
         
-    
+    def isPlainFile (self):
+        return smtquery.storage.smt.archive.isPlainPath (self._filepath)
+
+    # a plain file with the instance content, archived or compressed instances are streamed into the scratch area
+    def localPath (self):
+        if self.isPlainFile ():
+            return self._filepath
+        path = smtquery.solvers.staging.stagingPath ("instance.smt")
+        with self.open () as src, open (path,'wb') as dst:
+            shutil.copyfileobj (src,dst)
+        return path
+
+    # key under which results are shared, as in the result queries: the stored content hash,
+    # instances ingested without a hash are unique
+    def contentKey (self):
+        return self._content_hash or str(self._id)
+
+    # the hash stored at ingest, computed at most once otherwise
     def hashContent (self):
-        with open(self._filepath,'r') as ff:
-            return hashlib.sha256 (ff.read().encode ()).hexdigest ()
+        if self._content_hash == None:
+            self._content_hash = smtquery.storage.smt.scan.hashFile (self._filepath)
+        return self._content_hash
 
     def copyOutSMTFile (self,directory):
-        name = os.path.split (self._filepath)[1]
-        shutil.copyfile (self._filepath,os.path.join (directory,name))
+        name = smtquery.storage.smt.archive.stripCompression (os.path.split (self._filepath)[1])
+        with self.open () as src, open (os.path.join (directory,name),'wb') as dst:
+            shutil.copyfileobj (src,dst)
         return os.path.join (directory,name)
 
+    def getPath (self):
+        return self._filepath
+
     def getName (self):
         return self._name
 
@@ -51,10 +113,10 @@ class Track:
         self._makesmt = makesmt
 
     def filesInTrack (self):
-        conn = self._engine.connect ()
-        res = conn.execute (self._instance_table.select().where (self._instance_table.c.track_id == self._id))
-        for row in res.fetchall ():
-            yield self._makesmt (row.name,row.path,row.id)
+        query = self._instance_table.select().where (self._instance_table.c.track_id == self._id,
+                                                     sqlalchemy.not_ (self._instance_table.c.retired))
+        for row in _pages (self._engine,query,self._instance_table.c.id):
+            yield self._makesmt (row.name,row.path,row.id,row.content_hash)
     
     def getName (self):
         return self._name
@@ -70,9 +132,8 @@ class Benchmark:
         self._makesmt = makesmt
         
     def tracksInBenchmark (self):
-        conn = self._engine.connect ()
-        res = conn.execute (self._tracks_table.select().where (self._tracks_table.c.bench_id == self._id))
-        for row in res.fetchall ():
+        query = self._tracks_table.select().where (self._tracks_table.c.bench_id == self._id)
+        for row in _pages (self._engine,query,self._tracks_table.c.id):
             yield Track (row.name,self._engine,row.id,self._instancetable,self._makesmt)
             
     def filesInBenchmark (self):
@@ -86,21 +147,27 @@ class Benchmark:
 
     
 class DBFSStorage:
-    def __init__ (self,root,enginestring,intels = None):
+    def __init__ (self,root,enginestring,intels = None,busy_timeout = 30000,pool_size = 5,write_behind = None,catalog_check_interval = 5):
         self._root = os.path.abspath(root)        
-        self._engine = sqlalchemy.create_engine(enginestring)
+        self._write_behind = write_behind
+        self._writer = None
+        self._writer_pid = None
+        self._engine = smtquery.storage.smt.connection.createEngine (enginestring,busy_timeout,pool_size)
         
         self._meta = sqlalchemy.MetaData ()
         
         self._benchmark_table  = sqlalchemy.Table ('benchmark',self._meta,
                                sqlalchemy.Column ('id',sqlalchemy.Integer,primary_key = True),
-                               sqlalchemy.Column ('name',sqlalchemy.String (255),nullable = False)
+                               sqlalchemy.Column ('name',sqlalchemy.String (255),nullable = False),
+                               sqlalchemy.Index ('ix_benchmark_name','name'),
                                )
 
         self._tracks_table = sqlalchemy.Table ('track',self._meta,
                                  sqlalchemy.Column ('id',sqlalchemy.Integer,primary_key = True),
                                  sqlalchemy.Column ('name',sqlalchemy.String (255),nullable = False),
-                                 sqlalchemy.Column ('bench_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('benchmark.id'),nullable=False)
+                                 sqlalchemy.Column ('bench_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('benchmark.id'),nullable=False),
+                                 sqlalchemy.Index ('ix_track_name','name'),
+                                 sqlalchemy.Index ('ix_track_bench_id','bench_id'),
                                     )
 
         self._instance_table = sqlalchemy.Table ('instance', self._meta,
@@ -108,6 +175,13 @@ class DBFSStorage:
                              sqlalchemy.Column ('path',sqlalchemy.String(1024)),
                              sqlalchemy.Column ('name',sqlalchemy.String(255)),
                              sqlalchemy.Column ('track_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('track.id'),nullable=False),
+                             sqlalchemy.Column ('size',sqlalchemy.BigInteger),
+                             sqlalchemy.Column ('mtime',sqlalchemy.Float),
+                             sqlalchemy.Column ('content_hash',sqlalchemy.String(64)),
+                             sqlalchemy.Column ('retired',sqlalchemy.Boolean,nullable=False,server_default=sqlalchemy.false ()),
+                             sqlalchemy.Index ('ix_instance_name','name'),
+                             sqlalchemy.Index ('ix_instance_track_id','track_id'),
+                             sqlalchemy.Index ('ix_instance_content_hash','content_hash'),
                                                  )  
         
 
@@ -117,8 +191,43 @@ class DBFSStorage:
                                  sqlalchemy.Column ('result',sqlalchemy.Enum(smtquery.solvers.solver.Result),nullable=False),
                                  sqlalchemy.Column ('solver', sqlalchemy.String (255),nullable=False),
                                  sqlalchemy.Column ('time', sqlalchemy.Float,nullable=False),
+                                 # models before schema version 9, later models are stored in result_model
                                  sqlalchemy.Column ('model', sqlalchemy.Text),
                                  sqlalchemy.Column ('date', sqlalchemy.DateTime),
+                                 sqlalchemy.Column ('stale',sqlalchemy.Boolean,nullable=False,server_default=sqlalchemy.false ()),
+                                 sqlalchemy.Column ('solver_version', sqlalchemy.String (255)),
+                                 sqlalchemy.Column ('solver_hash', sqlalchemy.String (64)),
+                                 sqlalchemy.Column ('solver_options', sqlalchemy.String (1024)),
+                                 sqlalchemy.Column ('timeout', sqlalchemy.Float),
+                                 sqlalchemy.Column ('wall_time', sqlalchemy.Float),
+                                 sqlalchemy.Column ('cpu_user', sqlalchemy.Float),
+                                 sqlalchemy.Column ('cpu_sys', sqlalchemy.Float),
+                                 sqlalchemy.Column ('max_rss', sqlalchemy.BigInteger),
+                                 sqlalchemy.Column ('queue_wait', sqlalchemy.Float),
+                                 sqlalchemy.Column ('staging_time', sqlalchemy.Float),
+                                 sqlalchemy.Column ('preprocess_time', sqlalchemy.Float),
+                                 sqlalchemy.Column ('exit_signal', sqlalchemy.Integer),
+                                 sqlalchemy.Column ('stderr_tail', sqlalchemy.Text),
+                                 sqlalchemy.Column ('output_truncated', sqlalchemy.Boolean),
+                                 sqlalchemy.Column ('model_hash', sqlalchemy.String (64)),
+                                 # member of a portfolio that gave the answer
+                                 sqlalchemy.Column ('winner', sqlalchemy.String (255)),
+                                 # benchmark runs: number of runs, relative dispersion of their times
+                                 sqlalchemy.Column ('repetitions', sqlalchemy.Integer),
+                                 sqlalchemy.Column ('time_dispersion', sqlalchemy.Float),
+                                 sqlalchemy.Column ('noisy', sqlalchemy.Boolean),
+                                 sqlalchemy.Index ('ix_verification_result_instance_solver_date','instance_id','solver','date'),
+                                 )
+
+        self._latest_table = sqlalchemy.Table ('latest_result', self._meta,
+                                 sqlalchemy.Column ('instance_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('instance.id'),primary_key = True),
+                                 sqlalchemy.Column ('solver', sqlalchemy.String (255),primary_key = True),
+                                 sqlalchemy.Column ('solver_version', sqlalchemy.String (255),primary_key = True),
+                                 sqlalchemy.Column ('result_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('verification_result.id'),nullable=False),
+                                 sqlalchemy.Column ('date', sqlalchemy.DateTime),
+                                 sqlalchemy.Column ('solver_hash', sqlalchemy.String (64)),
+                                 sqlalchemy.Column ('solver_options', sqlalchemy.String (1024)),
+                                 sqlalchemy.Column ('timeout', sqlalchemy.Float),
                                  )
 
         self._validated_table = sqlalchemy.Table ('valdidated_results', self._meta,
@@ -126,144 +235,293 @@ class DBFSStorage:
                                  sqlalchemy.Column ('verification_result_id',sqlalchemy.Integer,sqlalchemy.ForeignKey('verification_result.id'),nullable=False),
                                  sqlalchemy.Column ('result',sqlalchemy.Enum(smtquery.solvers.solver.Verified),nullable=False),
                                  sqlalchemy.Column ('date', sqlalchemy.DateTime),
+                                 sqlalchemy.Index ('ix_valdidated_results_result_date','verification_result_id','date'),
+                                 )
+
+        # parsed models, compressed and shared by all results with the same model
+        self._model_table = sqlalchemy.Table ('result_model', self._meta,
+                                 sqlalchemy.Column ('hash', sqlalchemy.String (64),primary_key = True),
+                                 sqlalchemy.Column ('data', sqlalchemy.LargeBinary,nullable=False),
+                                 )
+
+        # superseded results and their verdicts moved out of the hot tables by compactResults
+        self._result_archive_table = _archiveTable ('verification_result_archive',self._meta,self._result_table)
+        self._validated_archive_table = _archiveTable ('valdidated_results_archive',self._meta,self._validated_table)
+
+        self._schema_version_table = sqlalchemy.Table ('schema_version', self._meta,
+                                 sqlalchemy.Column ('version',sqlalchemy.Integer,nullable=False),
+                                 )
+
+        self._catalog_version_table = sqlalchemy.Table ('catalog_version', self._meta,
+                                 sqlalchemy.Column ('version',sqlalchemy.Integer,nullable=False),
                                  )
 
-        self._makesmt = lambda name,filepath,id: smtquery.intel.intels.getIntel (SMTFile(name,filepath,id))
+        self._makesmt = lambda name,filepath,id,content_hash = None: smtquery.intel.intels.getIntel (SMTFile(name,filepath,id,content_hash))
+
+        smtquery.storage.smt.migrations.upgrade (self._engine,self._meta,self._schema_version_table)
+        self._catalog = smtquery.storage.smt.catalog.CatalogCache (self._engine,
+                                                                   (self._catalog_version_table,self._benchmark_table,self._tracks_table,self._instance_table),
+                                                                   catalog_check_interval)
+        # the writer installs its SIGTERM flush, which is only possible in the main thread;
+        # results are stored from the pool's result thread, so it is not created lazily there
+        self._resultWriter ()
 
         
-    def initialise_db (self):
+    def initialise_db (self,threads = 1,hashing = True):
         with  smtquery.ui.output.makeProgressor () as progress:
         
             progress.message ("Initialising Database")
-            self._meta.create_all (self._engine)
-
-            conn = self._engine.connect ()
-
-
-            for bench in os.listdir (self._root):
-                benchpath = os.path.join (self._root,bench)
-                if not os.path.isdir (benchpath):
-                    continue
-                bench_id = conn.execute (self._benchmark_table.insert ().values (name = bench)).inserted_primary_key[0]
-
-                for track in os.listdir (benchpath):
-                    trackpath = os.path.join (benchpath,track)
-                    if not os.path.isdir(trackpath):
-                        continue
-                    track_id = conn.execute (self._tracks_table.insert ().values (name = f"{bench}:{track}",
-                                                                            bench_id = bench_id)).inserted_primary_key[0]
-
-                    for instance in os.listdir (trackpath):
-                        if not (instance.endswith (".smt") or instance.endswith (".smt2") or instance.endswith (".smt25")):
-                            continue
-                        instancepath = os.path.join (trackpath,instance)
-                        dbvalues = {"name": f"{bench}:{track}:{instance}",
-                                    "path": instancepath,
-                                    "track_id": track_id}
-                        progress.message (f"Initialising Database: {bench}:{track}:{instance}  ")
-                        
-                        id = conn.execute (self._instance_table.insert ().values (
-                            name = f"{bench}:{track}:{instance}",
-                            path = instancepath,
-                            track_id = track_id
-                        )).inserted_primary_key[0]
-
-    def allocate_new_files_db (self):
+
+            total = 0
+            start = time.perf_counter ()
+            for bench,benchpath,tracks in smtquery.storage.smt.scan.scanRoot (self._root,threads,hashing):
+                progress.message (f"Initialising Database: {bench} ({total} instances so far)")
+                total += self._ingestBenchmark (bench,tracks)
+
+            self._catalogChanged ()
+            elapsed = time.perf_counter () - start
+            rate = total / elapsed if elapsed > 0 else 0
+            progress.message (f"Initialised Database: {total} instances in {elapsed:.2f}s ({rate:.0f} instances/s)")
+
+    # one transaction per benchmark, instances are inserted with a single executemany
+    def _ingestBenchmark (self,bench,tracks):
+        with self._engine.begin () as conn:
+            bench_id = conn.execute (self._benchmark_table.insert ().values (name = bench)).inserted_primary_key[0]
+            rows = []
+            for track,trackpath,instances in tracks:
+                track_id = conn.execute (self._tracks_table.insert ().values (name = f"{bench}:{track}",
+                                                                              bench_id = bench_id)).inserted_primary_key[0]
+                for instance,instancepath,size,mtime,content_hash in instances:
+                    rows.append ({"name": f"{bench}:{track}:{instance}",
+                                  "path": instancepath,
+                                  "track_id": track_id,
+                                  "size": size,
+                                  "mtime": mtime,
+                                  "content_hash": content_hash})
+            if rows:
+                conn.execute (self._instance_table.insert (),rows)
+        return len(rows)
+
+    def _loadCatalog (self,conn):
+        benchmarks = {row.name : row.id for row in conn.execute (sqlalchemy.select (self._benchmark_table.c.name,self._benchmark_table.c.id))}
+        tracks = {row.name : row.id for row in conn.execute (sqlalchemy.select (self._tracks_table.c.name,self._tracks_table.c.id))}
+        instances = {row.name : row for row in conn.execute (sqlalchemy.select (self._instance_table.c.name,
+                                                                                self._instance_table.c.id,
+                                                                                self._instance_table.c.size,
+                                                                                self._instance_table.c.mtime,
+                                                                                self._instance_table.c.content_hash,
+                                                                                self._instance_table.c.retired))}
+        return benchmarks,tracks,instances
+
+    # incremental synchronisation of the catalog with the file system:
+    # the existing catalog is loaded once and diffed in memory, new instances are inserted,
+    # changed instances (size/mtime, and content hash if hashing) are updated and their results marked stale,
+    # instances no longer present on disk are retired; with hashing the scan hashes every instance
+    # (concurrently per benchmark, bundles in a single pass)
+    def allocate_new_files_db (self,threads = 1,hashing = True):
         with  smtquery.ui.output.makeProgressor () as progress:
         
-            progress.message ("Adding new files to the Database")
-            self._meta.create_all (self._engine)
-            conn = self._engine.connect ()
-
-
-            for bench in os.listdir (self._root):
-                benchpath = os.path.join (self._root,bench)
-                if not os.path.isdir (benchpath):
-                    continue
-
-                # benchmark already added?
-                res = conn.execute (self._benchmark_table.select ().where ( self._benchmark_table.c.name == f"{bench}")).fetchall()
-                if len(res) > 0:
-                    bench_id = res[0][0]
-                else:
-                    bench_id = conn.execute (self._benchmark_table.insert ().values (name = bench)).inserted_primary_key[0]
-
-                for track in os.listdir (benchpath):
-                    trackpath = os.path.join (benchpath,track)
-                    if not os.path.isdir(trackpath):
-                        continue
-
-                    # track already added?
-                    res = conn.execute (self._tracks_table.select ().where ( self._tracks_table.c.name == f"{bench}:{track}")).fetchall()
-                    if len(res) > 0:
-                        track_id = res[0][0]
-                    else:
-                        track_id = conn.execute (self._tracks_table.insert ().values (name = f"{bench}:{track}",
-                                                                            bench_id = bench_id)).inserted_primary_key[0]
-
-                    for instance in os.listdir (trackpath):
-                        if not (instance.endswith (".smt") or instance.endswith (".smt2") or instance.endswith (".smt25")):
-                            continue
-
-                        # track already added?
-                        res = conn.execute (self._instance_table.select ().where ( self._instance_table.c.name == f"{bench}:{track}:{instance}")).fetchall()
-                        if len(res) > 0:
-                            continue
-
-                        print(f"Not found {bench}:{track}:{instance}")
-
-                        instancepath = os.path.join (trackpath,instance)
-                        dbvalues = {"name": f"{bench}:{track}:{instance}",
-                                    "path": instancepath,
-                                    "track_id": track_id}
-                        progress.message (f"Adding to Database: {bench}:{track}:{instance}  ")
-                        
-                        id = conn.execute (self._instance_table.insert ().values (
-                            name = f"{bench}:{track}:{instance}",
-                            path = instancepath,
-                            track_id = track_id
-                        )).inserted_primary_key[0]
+            progress.message ("Synchronising Database")
+            start = time.perf_counter ()
+
+            with self._engine.connect () as conn:
+                benchmarks,tracks,instances = self._loadCatalog (conn)
+
+            seen = set ()
+            inserted,changed,stale = 0,0,0
+            for bench,benchpath,benchtracks in smtquery.storage.smt.scan.scanRoot (self._root,threads,hashing):
+                progress.message (f"Synchronising Database: {bench}")
+                new_rows = []
+                update_rows = []
+                with self._engine.begin () as conn:
+                    if bench not in benchmarks:
+                        benchmarks[bench] = conn.execute (self._benchmark_table.insert ().values (name = bench)).inserted_primary_key[0]
+
+                    for track,trackpath,trackinstances in benchtracks:
+                        trackname = f"{bench}:{track}"
+                        if trackname not in tracks:
+                            tracks[trackname] = conn.execute (self._tracks_table.insert ().values (name = trackname,
+                                                                                                  bench_id = benchmarks[bench])).inserted_primary_key[0]
+
+                        for instance,instancepath,size,mtime,content_hash in trackinstances:
+                            name = f"{trackname}:{instance}"
+                            seen.add (name)
+                            known = instances.get (name)
+                            if known == None:
+                                new_rows.append ({"name": name,
+                                                  "path": instancepath,
+                                                  "track_id": tracks[trackname],
+                                                  "size": size,
+                                                  "mtime": mtime,
+                                                  "content_hash": content_hash})
+                                continue
+                            # rows from older catalogs carry no size/mtime yet, these are only recorded
+                            recorded = known.size != None
+                            statchanged = known.size != size or known.mtime != mtime
+                            unhashed = hashing and known.content_hash == None
+                            if not statchanged and not known.retired and not unhashed:
+                                continue
+
+                            modified = recorded and statchanged
+                            if hashing:
+                                modified = modified and content_hash != known.content_hash
+                            elif modified:
+                                content_hash = None
+                            else:
+                                content_hash = known.content_hash
+                            update_rows.append ({"b_id": known.id,
+                                                 "b_path": instancepath,
+                                                 "b_size": size,
+                                                 "b_mtime": mtime,
+                                                 "b_content_hash": content_hash,
+                                                 "b_stale": modified})
+
+                    if new_rows:
+                        conn.execute (self._instance_table.insert (),new_rows)
+                    if update_rows:
+                        conn.execute (self._instance_table.update ()
+                                      .where (self._instance_table.c.id == sqlalchemy.bindparam ("b_id"))
+                                      .values (path = sqlalchemy.bindparam ("b_path"),
+                                               size = sqlalchemy.bindparam ("b_size"),
+                                               mtime = sqlalchemy.bindparam ("b_mtime"),
+                                               content_hash = sqlalchemy.bindparam ("b_content_hash"),
+                                               retired = False),
+                                      [{k : v for k,v in r.items () if k != "b_stale"} for r in update_rows])
+                        stale_ids = [r["b_id"] for r in update_rows if r["b_stale"]]
+                        for ids in _chunks (stale_ids):
+                            conn.execute (self._result_table.update ()
+                                          .where (self._result_table.c.instance_id.in_ (ids))
+                                          .values (stale = True))
+                        smtquery.storage.smt.latest.refresh (conn,self._result_table,self._latest_table,stale_ids)
+                        stale += len(stale_ids)
+                inserted += len(new_rows)
+                changed += len(update_rows)
+
+            retired_ids = [row.id for name,row in instances.items () if name not in seen and not row.retired]
+            with self._engine.begin () as conn:
+                for ids in _chunks (retired_ids):
+                    conn.execute (self._instance_table.update ()
+                                  .where (self._instance_table.c.id.in_ (ids))
+                                  .values (retired = True))
+
+                if inserted or changed or retired_ids:
+                    smtquery.storage.smt.catalog.bumpVersion (conn,self._catalog_version_table)
+            self._catalog.invalidate ()
+
+            elapsed = time.perf_counter () - start
+            progress.message (f"Synchronised Database: {inserted} new, {changed} changed ({stale} with stale results), {len(retired_ids)} retired in {elapsed:.2f}s")
 
         
+    # cached catalog of this process, see catalog.py
+    def catalog (self):
+        return self._catalog.get ()
+
+    def _catalogChanged (self):
+        with self._engine.begin () as conn:
+            smtquery.storage.smt.catalog.bumpVersion (conn,self._catalog_version_table)
+        self._catalog.invalidate ()
+
+    def getBenchmark (self,name):
+        id = self.catalog ().benchmarkId (name)
+        if id == None:
+            return None
+        return Benchmark (name,self._engine,id,self._tracks_table,self._instance_table,self._makesmt)
+
+    def getTrack (self,bench,track):
+        entry = self.catalog ().track (f"{bench}:{track}")
+        if entry == None:
+            return None
+        return Track (f"{bench}:{track}",self._engine,entry[0],self._instance_table,self._makesmt)
+
     def getBenchmarks (self):
-        conn = self._engine.connect ()
-        res = conn.execute (self._benchmark_table.select ())
-        for row in res.fetchall ():
+        with self._engine.connect () as conn:
+            rows = conn.execute (self._benchmark_table.select ()).fetchall ()
+        for row in rows:
             yield Benchmark (row.name,self._engine,row.id,self._tracks_table,self._instance_table,self._makesmt)
     
     def searchFile (self,bench,track,file):
-        conn = self._engine.connect ()
-        res = conn.execute (self._instance_table.select ().where ( self._instance_table.c.name == f"{bench}:{track}:{file}"))
-        for row in res.fetchall ():
-            return self._makesmt (row.name,row.path,row.id)
-        return None
+        name = f"{bench}:{track}:{file}"
+        entry = self.catalog ().instance (name)
+        if entry == None:
+            return None
+        id,path,content_hash,track_id = entry
+        return self._makesmt (name,path,id,content_hash)
 
     def allFiles (self):
-        conn = self._engine.connect ()
-        res = conn.execute (self._instance_table.select ())
-        for row in res.fetchall ():
-            yield self._makesmt (row.name,row.path,row.id)        
+        query = self._instance_table.select ().where (sqlalchemy.not_ (self._instance_table.c.retired))
+        for row in _pages (self._engine,query,self._instance_table.c.id):
+            yield self._makesmt (row.name,row.path,row.id,row.content_hash)        
     
-    def storeResult (self,result,smtfile,solver):
-        conn = self._engine.connect ()
-        query = self._result_table.insert().values (
-            instance_id = smtfile.getId (),
-            result = result.getResult(),
-            solver = solver.getName(),
-            time = result.getTime(),
-            model = result.getModel (),
-            date = datetime.datetime.now ()
-        )
-        conn.execute (query)
+    # buffered writer for results and verdicts if write_behind is configured, created per process
+    def _resultWriter (self):
+        if self._write_behind == None:
+            return None
+        if self._writer_pid != os.getpid ():
+            self._writer = smtquery.storage.smt.writer.ResultWriter (self,
+                                                                     self._write_behind.get ("rows",200),
+                                                                     self._write_behind.get ("interval",500),
+                                                                     self._write_behind.get ("spool"))
+            self._writer_pid = os.getpid ()
+        return self._writer
+
+    # makes buffered results visible to queries of this process
+    def flushResults (self):
+        if self._writer != None and self._writer_pid == os.getpid ():
+            self._writer.flush ()
+
+    # replaces the model text of result rows by the hash of the stored model
+    def _storeModels (self,conn,results):
+        blobs = dict()
+        rows = []
+        for row in results:
+            encoded = smtquery.storage.smt.models.encode (row.get ("model"))
+            if encoded != None:
+                blobs[encoded[0]] = encoded[1]
+            rows.append (dict(row,model = None,model_hash = encoded[0] if encoded != None else None))
+        m = self._model_table
+        for hashes in _chunks (list(blobs.keys ()),500):
+            existing = set (conn.execute (sqlalchemy.select (m.c.hash).where (m.c.hash.in_ (hashes))).scalars ())
+            missing = [{"hash" : h, "data" : blobs[h]} for h in hashes if h not in existing]
+            if missing:
+                conn.execute (m.insert (),missing)
+        return rows
+
+    def loadModel (self,model_hash):
+        with self._engine.connect () as conn:
+            return conn.execute (sqlalchemy.select (self._model_table.c.data).where (self._model_table.c.hash == model_hash)).scalar_one ()
+
+    def _model (self,model_hash):
+        if model_hash == None:
+            return None
+        return smtquery.storage.smt.models.StoredModel (self.loadModel,model_hash)
+
+    def storeRows (self,results,verdicts):
+        with self._engine.begin () as conn:
+            if results:
+                conn.execute (self._result_table.insert (),self._storeModels (conn,results))
+                smtquery.storage.smt.latest.refresh (conn,self._result_table,self._latest_table,{r["instance_id"] for r in results})
+            if verdicts:
+                conn.execute (self._validated_table.insert (),verdicts)
+
+    def storeResult (self,result,smtfile,solver,timeout = None):
+        writer = self._resultWriter ()
+        if writer != None:
+            writer.addResult (result,smtfile,solver,timeout)
+            return
+        self.storeRows ([smtquery.storage.smt.writer.resultRow (result,smtfile,solver,timeout)],[])
 
     def storeVerified (self,result,verified):
-        conn = self._engine.connect ()
+        writer = self._resultWriter ()
+        if writer != None:
+            writer.addVerified (result,verified)
+            return
         query = self._validated_table.insert().values (
             verification_result_id = result["r_id"],
             result = verified,
             date = datetime.datetime.now ()
         )    
-        conn.execute (query)
+        with self._engine.begin () as conn:
+            conn.execute (query)
 
     def storagePredicates (self):
         return smtquery.intel.intels.predicates ()
@@ -277,22 +535,219 @@ class DBFSStorage:
 
     # queries
     def getResultsForBenchmarkId(self,id):
-        conn = self._engine.connect ()
-        res = conn.execute (self._result_table.select ().where ( self._result_table.c.instance_id == id).order_by(self._result_table.c.date.desc()))
-        results = dict()
-        for row in res.fetchall ():
-            # fetch verified
-            verified = None
-            v_res = conn.execute (self._validated_table.select ().where ( self._validated_table.c.verification_result_id == row.id).order_by(self._validated_table.c.date.desc()))
-            v_results = v_res.fetchall()
-            if len(v_results) > 0:
-                verified = v_results[0].result
-            results[row.solver] = {"r_id" : row.id, "result" : row.result, "time" : row.time, "model" : row.model, "verified": verified}
-
-        return results
-
-
-
-
-
-
+        for instance_id,results in self.getLatestResults ([id]):
+            return results
+        return dict()
+
+    def getInstanceIds (self,names):
+        return self.catalog ().instanceIds (names)
+
+    def _selectInstanceIds (self,track = None,benchmark = None):
+        query = sqlalchemy.select (self._instance_table.c.id).where (sqlalchemy.not_ (self._instance_table.c.retired))
+        if track != None or benchmark != None:
+            query = query.join (self._tracks_table,self._tracks_table.c.id == self._instance_table.c.track_id)
+        if track != None:
+            query = query.where (self._tracks_table.c.name == track)
+        if benchmark != None:
+            query = (query.join (self._benchmark_table,self._benchmark_table.c.id == self._tracks_table.c.bench_id)
+                     .where (self._benchmark_table.c.name == benchmark))
+        with self._engine.connect () as conn:
+            return [row.id for row in conn.execute (query.order_by (self._instance_table.c.id))]
+
+    # results are shared between instances with identical content: the latest result per
+    # (content,solver) is returned, instances without a content hash only see their own results.
+    # Candidates come from latest_result, one row per (instance,solver,solver version)
+    def _latestResultsQuery (self,ids,hashes):
+        r = self._result_table
+        l = self._latest_table
+        v = self._validated_table
+        i = self._instance_table
+        content_key = sqlalchemy.func.coalesce (i.c.content_hash,sqlalchemy.cast (i.c.id,sqlalchemy.String))
+        owners = sqlalchemy.or_ (i.c.id.in_ (ids),i.c.content_hash.in_ (hashes))
+        latest = (sqlalchemy.select (l.c.result_id.label ("id"),content_key.label ("content_key"),l.c.solver,
+                                     sqlalchemy.func.row_number ().over (partition_by = (content_key,l.c.solver),
+                                                                         order_by = (l.c.date.desc (),l.c.result_id.desc ())).label ("rank"))
+                  .select_from (l.join (i,i.c.id == l.c.instance_id))
+                  .where (owners)
+                  .subquery ())
+        verdicts = (sqlalchemy.select (v.c.verification_result_id,v.c.result,
+                                       sqlalchemy.func.row_number ().over (partition_by = v.c.verification_result_id,
+                                                                           order_by = (v.c.date.desc (),v.c.id.desc ())).label ("rank"))
+                    .where (v.c.verification_result_id.in_ (sqlalchemy.select (l.c.result_id)
+                                                            .select_from (l.join (i,i.c.id == l.c.instance_id))
+                                                            .where (owners)))
+                    .subquery ())
+        return (sqlalchemy.select (latest.c.id,latest.c.content_key,latest.c.solver,r.c.result,r.c.time,r.c.model_hash,
+                                   (r.c.cpu_user + r.c.cpu_sys).label ("cpu_time"),r.c.noisy,
+                                   verdicts.c.result.label ("verified"))
+                .select_from (latest.join (r,r.c.id == latest.c.id)
+                              .outerjoin (verdicts,sqlalchemy.and_ (verdicts.c.verification_result_id == latest.c.id,
+                                                                   verdicts.c.rank == 1)))
+                .where (latest.c.rank == 1))
+
+    # latest non-stale result and latest verdict per (instance,solver) for many instances,
+    # one windowed query per chunk of instance ids; yields (instance_id,{solver : result})
+    # for every instance having results, instances are selected by id, by track or by benchmark name
+    def getLatestResults (self,instance_ids = None,track = None,benchmark = None,chunksize = 200):
+        self.flushResults ()
+        if instance_ids == None:
+            instance_ids = self._selectInstanceIds (track,benchmark)
+        for ids in _chunks (instance_ids,chunksize):
+            with self._engine.connect () as conn:
+                instances = conn.execute (sqlalchemy.select (self._instance_table.c.id,self._instance_table.c.content_hash)
+                                          .where (self._instance_table.c.id.in_ (ids))).fetchall ()
+                keys = {row.id : row.content_hash or str(row.id) for row in instances}
+                hashes = list({row.content_hash for row in instances if row.content_hash != None})
+                rows = conn.execute (self._latestResultsQuery (ids,hashes)).fetchall ()
+            bykey = dict()
+            for row in rows:
+                bykey.setdefault (row.content_key,dict())[row.solver] = {"r_id" : row.id, "result" : row.result, "time" : row.time, "cpu_time" : row.cpu_time, "noisy" : bool (row.noisy), "model" : self._model (row.model_hash), "verified": row.verified}
+            for instance_id in ids:
+                if keys.get (instance_id) in bykey:
+                    yield instance_id,dict(bykey[keys[instance_id]])
+
+    # streaming export: rows with id > after_id in id order, yielded as lists of dicts of
+    # at most chunksize rows, all read in a single query
+    def _exportQuery (self,kind):
+        i,t,b = self._instance_table,self._tracks_table,self._benchmark_table
+        r,v = self._result_table,self._validated_table
+        if kind == "instances":
+            return (sqlalchemy.select (i.c.id,i.c.name,b.c.name.label ("benchmark"),t.c.name.label ("track"),i.c.path,
+                                       i.c.size,i.c.mtime,i.c.content_hash,i.c.retired)
+                    .select_from (i.join (t,t.c.id == i.c.track_id).join (b,b.c.id == t.c.bench_id))),i.c.id
+        if kind == "results":
+            return sqlalchemy.select (r.c.id,r.c.instance_id,r.c.solver,r.c.solver_version,r.c.result,r.c.time,r.c.date,r.c.stale,
+                                      *[r.c[name] for name in smtquery.storage.smt.writer.STAT_COLUMNS]),r.c.id
+        if kind == "verdicts":
+            return sqlalchemy.select (v.c.id,v.c.verification_result_id,v.c.result,v.c.date),v.c.id
+        raise ValueError (f"Unknown export {kind}")
+
+    def exportRows (self,kind,after_id = 0,chunksize = 10000):
+        self.flushResults ()
+        query,key = self._exportQuery (kind)
+        with self._engine.connect () as conn:
+            res = conn.execution_options (stream_results = True).execute (query.where (key > after_id).order_by (key))
+            for chunk in res.mappings ().partitions (chunksize):
+                yield [dict(row) for row in chunk]
+
+    # latest non-stale result per (instance,solver) joined with its latest verdict
+    def exportLatestResults (self,chunksize = 10000):
+        self.flushResults ()
+        r = self._result_table
+        l = self._latest_table
+        v = self._validated_table
+        latest = (sqlalchemy.select (l.c.result_id,l.c.instance_id,l.c.solver,
+                                     sqlalchemy.func.row_number ().over (partition_by = (l.c.instance_id,l.c.solver),
+                                                                         order_by = (l.c.date.desc (),l.c.result_id.desc ())).label ("rank"))
+                  .subquery ())
+        verdicts = (sqlalchemy.select (v.c.verification_result_id,v.c.result,
+                                       sqlalchemy.func.row_number ().over (partition_by = v.c.verification_result_id,
+                                                                           order_by = (v.c.date.desc (),v.c.id.desc ())).label ("rank"))
+                    .where (v.c.verification_result_id.in_ (sqlalchemy.select (l.c.result_id)))
+                    .subquery ())
+        query = (sqlalchemy.select (r.c.id,r.c.instance_id,r.c.solver,r.c.solver_version,r.c.result,r.c.time,r.c.date,
+                                    verdicts.c.result.label ("verified"))
+                 .select_from (latest.join (r,r.c.id == latest.c.result_id)
+                               .outerjoin (verdicts,sqlalchemy.and_ (verdicts.c.verification_result_id == r.c.id,
+                                                                    verdicts.c.rank == 1)))
+                 .where (latest.c.rank == 1)
+                 .order_by (latest.c.instance_id,latest.c.solver))
+        with self._engine.connect () as conn:
+            res = conn.execution_options (stream_results = True).execute (query)
+            for chunk in res.mappings ().partitions (chunksize):
+                yield [dict(row) for row in chunk]
+
+    # moves superseded results (all but the latest per (instance,solver,solver version) and the
+    # `keep` newest before it, optionally only those older than `before`) and their verdicts into
+    # the archive tables, or appends them to archive_file as JSON lines; returns the number of results moved
+    def compactResults (self,keep = 0,before = None,archive_file = None,chunksize = 500):
+        self.flushResults ()
+        r = self._result_table
+        v = self._validated_table
+        with self._engine.connect () as conn:
+            ids = smtquery.storage.smt.latest.superseded (conn,r,self._latest_table,keep,before)
+        archived = datetime.datetime.now ()
+        out = gzip.open (archive_file,'at') if archive_file != None else None
+        try:
+            for chunk in _chunks (ids,chunksize):
+                with self._engine.begin () as conn:
+                    results = [dict(row) for row in conn.execute (r.select ().where (r.c.id.in_ (chunk))).mappings ()]
+                    verdicts = [dict(row) for row in conn.execute (v.select ().where (v.c.verification_result_id.in_ (chunk))).mappings ()]
+                    if out != None:
+                        # the archive file holds the model text, its stored model may be dropped
+                        m = self._model_table
+                        hashes = list({row["model_hash"] for row in results if row["model_hash"] != None})
+                        blobs = dict(conn.execute (sqlalchemy.select (m.c.hash,m.c.data).where (m.c.hash.in_ (hashes))).all ())
+                        for row in results:
+                            if row["model_hash"] != None:
+                                row["model"] = smtquery.storage.smt.models.render (smtquery.storage.smt.models.decode (blobs[row["model_hash"]]))
+                        for kind,rows in (("result",results),("verified",verdicts)):
+                            for row in rows:
+                                out.write (json.dumps (smtquery.storage.smt.writer.encodeRow (kind == "result",row)) + "\n")
+                    else:
+                        conn.execute (self._result_archive_table.insert (),[dict(row,archived = archived) for row in results])
+                        if verdicts:
+                            conn.execute (self._validated_archive_table.insert (),[dict(row,archived = archived) for row in verdicts])
+                    conn.execute (v.delete ().where (v.c.verification_result_id.in_ (chunk)))
+                    conn.execute (r.delete ().where (r.c.id.in_ (chunk)))
+                if out != None:
+                    out.flush ()
+        finally:
+            if out != None:
+                out.close ()
+        self._dropUnusedModels ()
+        return len(ids)
+
+    def _dropUnusedModels (self):
+        m = self._model_table
+        with self._engine.begin () as conn:
+            conn.execute (m.delete ().where (m.c.hash.not_in (sqlalchemy.select (self._result_table.c.model_hash)
+                                                               .where (self._result_table.c.model_hash != None)),
+                                             m.c.hash.not_in (sqlalchemy.select (self._result_archive_table.c.model_hash)
+                                                               .where (self._result_archive_table.c.model_hash != None))))
+
+    # a cached result is valid for a run if it was produced by the same solver binary with the
+    # same options, and its timeout is compatible: answers found in t seconds hold for any
+    # timeout >= t, a TimeOut at T holds for any timeout <= T
+    def _validFor (self,row,solver,timeout):
+        if row.solver_hash != solver.solverHash () or row.solver_options != solver.solverOptions ():
+            return False
+        if row.result == smtquery.solvers.solver.Result.TimeOut:
+            return row.timeout != None and timeout != None and timeout <= row.timeout
+        return timeout == None or row.time <= timeout
+
+    # (instance_id,solvername) pairs that need no run because latest_result holds a valid
+    # result for the instance or for an instance with identical content
+    def cachedRuns (self,instance_ids,solvers,timeout,chunksize = 200,repetitions = 1):
+        return set (self.cachedResults (instance_ids,solvers,timeout,chunksize,repetitions).keys ())
+
+    # the Result of every valid cached run, keyed by (instance_id,solvername); with repetitions
+    # only results of benchmark runs with at least as many runs are valid
+    def cachedResults (self,instance_ids,solvers,timeout,chunksize = 200,repetitions = 1):
+        self.flushResults ()
+        l = self._latest_table
+        i = self._instance_table
+        r = self._result_table
+        cached = dict()
+        for ids in _chunks (instance_ids,chunksize):
+            with self._engine.connect () as conn:
+                instances = conn.execute (sqlalchemy.select (i.c.id,i.c.content_hash).where (i.c.id.in_ (ids))).fetchall ()
+                keys = {row.id : row.content_hash or str(row.id) for row in instances}
+                hashes = list({row.content_hash for row in instances if row.content_hash != None})
+                rows = conn.execute (sqlalchemy.select (i.c.id,i.c.content_hash,l.c.solver,l.c.solver_hash,l.c.solver_options,l.c.timeout,
+                                                        r.c.result,r.c.time,r.c.repetitions)
+                                     .select_from (l.join (i,i.c.id == l.c.instance_id).join (r,r.c.id == l.c.result_id))
+                                     .where (sqlalchemy.or_ (i.c.id.in_ (ids),i.c.content_hash.in_ (hashes)),
+                                             l.c.solver.in_ (list(solvers.keys ())))).fetchall ()
+            valid = {(row.content_hash or str(row.id),row.solver) : row.result for row in rows
+                     if self._validFor (row,solvers[row.solver],timeout) and (row.repetitions or 1) >= repetitions}
+            cached.update (((instance_id,name),valid[(keys.get (instance_id),name)])
+                           for instance_id in ids for name in solvers.keys () if (keys.get (instance_id),name) in valid)
+        return cached
+
+    # latest results keyed by instance name, names without an instance in the catalog are skipped
+    def getLatestResultsByName (self,names,chunksize = 400):
+        ids = self.getInstanceIds (names)
+        byid = {i : name for name,i in ids.items ()}
+        for instance_id,results in self.getLatestResults (list(ids.values ()),chunksize = chunksize):
+            yield byid[instance_id],results
@@ -1,28 +1,47 @@
 import os
-import hashlib
 import shutil
+import smtquery.storage.smt.scan
+import smtquery.storage.smt.archive
+import smtquery.solvers.staging
 
 class SMTFile:
     def __init__(self,name,filepath):
-        assert (os.path.exists(filepath))
+        assert (smtquery.storage.smt.archive.exists(filepath))
         self._name = name
         self._filepath = filepath
         
-        
+    # instances may be plain files, compressed files or archive members
+    def open (self):
+        return smtquery.storage.smt.archive.openInstance (self._filepath)
+
     def SMTString (self):
-        with open(self._filepath,'r') as ff:
-            return ff.read ()
+        with self.open () as ff:
+            return ff.read ().decode ()
         
+    def isPlainFile (self):
+        return smtquery.storage.smt.archive.isPlainPath (self._filepath)
+
+    # a plain file with the instance content, archived or compressed instances are streamed into the scratch area
+    def localPath (self):
+        if self.isPlainFile ():
+            return self._filepath
+        path = smtquery.solvers.staging.stagingPath ("instance.smt")
+        with self.open () as src, open (path,'wb') as dst:
+            shutil.copyfileobj (src,dst)
+        return path
     
     def hashContent (self):
-        with open(self._filepath,'r') as ff:
-            return hashlib.sha256 (ff.read().encode ()).hexdigest ()
+        return smtquery.storage.smt.scan.hashFile (self._filepath)
 
     def copyOutSMTFile (self,directory):
-        name = os.path.split (self._filepath)[1]
-        shutil.copyfile (self._filepath,os.path.join (directory,name))
+        name = smtquery.storage.smt.archive.stripCompression (os.path.split (self._filepath)[1])
+        with self.open () as src, open (os.path.join (directory,name),'wb') as dst:
+            shutil.copyfileobj (src,dst)
         return os.path.join (directory,name)
 
+    def getPath (self):
+        return self._filepath
+
     def getName (self):
         return self._name
     
@@ -32,15 +51,18 @@ class SMTTrack:
         assert (os.path.exists(directory))
         self._directory = directory
 
+    def getName (self):
+        return self._name
+
     def filesInTrack (self):
         for root, dirs,files in os.walk (self._directory):
             for f in files:
-                if f.endswith (".smt") or f.endswith (".smt2") or f.endswith (".smt25"):
+                if smtquery.storage.smt.scan.isSMTFileName (f):
                     yield SMTFile (f"{self._name}:{f}",os.path.join (root,f))
     
 
     def searchFile (self,searchname):
-        if searchname.endswith (".smt") or searchname.endswith (".smt2") or searchname.endswith (".smt25"):
+        if smtquery.storage.smt.scan.isSMTFileName (searchname):
             name = searchname
         else:
             name = f"{searchname}.smt"
@@ -50,6 +72,25 @@ class SMTTrack:
             return None
         
 
+# a track stored inside a benchmark bundle
+class SMTArchiveTrack:
+    def __init__(self,name,instances):
+        self._name = name
+        self._instances = instances
+
+    def getName (self):
+        return self._name
+
+    def filesInTrack (self):
+        for instance,path,size,mtime,content_hash in self._instances:
+            yield SMTFile (f"{self._name}:{instance}",path)
+
+    def searchFile (self,searchname):
+        for instance,path,size,mtime,content_hash in self._instances:
+            if instance in [searchname,f"{searchname}.smt"]:
+                return SMTFile (f"{self._name}:{instance}",path)
+        return None
+
 class SMTStorage:
     def __init__(self,directory):
         self._directory = directory
@@ -61,12 +102,25 @@ class SMTStorage:
             if len(files) > 0:
                 d = os.path.split (root)[1]
                 yield SMTTrack (f"{d}",root)
+            for f in files:
+                if smtquery.storage.smt.archive.isArchive (f):
+                    yield from self._archiveTracks (os.path.join (root,f))
                 
+    def _archiveTracks (self,path):
+        bench,benchpath,tracks = smtquery.storage.smt.scan.scanArchiveBenchmark (smtquery.storage.smt.archive.archiveStem (os.path.basename (path)),path)
+        for track,trackpath,instances in tracks:
+            yield SMTArchiveTrack (track,instances)
+
     def searchForTrack (self,name):
         if os.path.exists (os.path.join (self._directory,name)):
             return SMTTrack (name,os.path.join (self._directory,name))
-        else:
-            return None
+        for f in os.listdir (self._directory):
+            if smtquery.storage.smt.archive.isArchive (f):
+                for track in self._archiveTracks (os.path.join (self._directory,f)):
+                    if track.getName () == name:
+                        return track
+        return None
     
     
             
+
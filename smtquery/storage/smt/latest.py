@@ -0,0 +1,51 @@
+import sqlalchemy
+
+# latest_result materialises the newest non-stale result per (instance,solver,solver version),
+# so reads never sort the result history. It is refreshed for the affected instances whenever
+# results are written or marked stale; results of unknown version are stored with version "".
+
+def _chunks (values,size = 500):
+    values = list(values)
+    for i in range (0,len(values),size):
+        yield values[i:i+size]
+
+def _version (result_table):
+    return sqlalchemy.func.coalesce (result_table.c.solver_version,"")
+
+def refresh (conn,result_table,latest_table,instance_ids = None):
+    r = result_table
+    ranked = (sqlalchemy.select (r.c.instance_id,r.c.solver,_version (r).label ("solver_version"),r.c.id,r.c.date,
+                                 r.c.solver_hash,r.c.solver_options,r.c.timeout,
+                                 sqlalchemy.func.row_number ().over (partition_by = (r.c.instance_id,r.c.solver,_version (r)),
+                                                                     order_by = (r.c.date.desc (),r.c.id.desc ())).label ("rank"))
+              .where (sqlalchemy.not_ (r.c.stale)))
+    if instance_ids == None:
+        conn.execute (latest_table.delete ())
+        batches = [ranked]
+    else:
+        batches = []
+        for ids in _chunks (instance_ids):
+            conn.execute (latest_table.delete ().where (latest_table.c.instance_id.in_ (ids)))
+            batches.append (ranked.where (r.c.instance_id.in_ (ids)))
+
+    for query in batches:
+        sub = query.subquery ()
+        conn.execute (latest_table.insert ().from_select (["instance_id","solver","solver_version","result_id","date",
+                                                           "solver_hash","solver_options","timeout"],
+                                                          sqlalchemy.select (sub.c.instance_id,sub.c.solver,sub.c.solver_version,sub.c.id,sub.c.date,
+                                                                             sub.c.solver_hash,sub.c.solver_options,sub.c.timeout)
+                                                          .where (sub.c.rank == 1)))
+
+# ids of superseded results: results that are not the latest of their (instance,solver,version)
+# beyond the newest `keep` of them, optionally only those older than `before`
+def superseded (conn,result_table,latest_table,keep = 0,before = None):
+    r = result_table
+    ranked = (sqlalchemy.select (r.c.id,r.c.date,
+                                 sqlalchemy.func.row_number ().over (partition_by = (r.c.instance_id,r.c.solver,_version (r)),
+                                                                     order_by = (r.c.date.desc (),r.c.id.desc ())).label ("rank"))
+              .where (r.c.id.not_in (sqlalchemy.select (latest_table.c.result_id)))
+              .subquery ())
+    query = sqlalchemy.select (ranked.c.id).where (ranked.c.rank > keep)
+    if before != None:
+        query = query.where (ranked.c.date < before)
+    return [row.id for row in conn.execute (query.order_by (ranked.c.id))]
@@ -0,0 +1,124 @@
+import logging
+import sqlalchemy
+import smtquery.storage.smt.latest
+import smtquery.storage.smt.models
+
+# Forward migrations of the DBFS catalog. Catalogs created before the
+# schema_version table existed are version 1. migrations[v] upgrades a
+# catalog from version v-1 to v; every step has to be idempotent.
+
+def _addColumns (conn,table,names):
+    existing = {c["name"] for c in sqlalchemy.inspect (conn).get_columns (table.name)}
+    for name in names:
+        if name not in existing:
+            ddl = sqlalchemy.schema.CreateColumn (table.c[name]).compile (dialect = conn.dialect)
+            conn.execute (sqlalchemy.text (f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+def _createIndexes (conn,meta,names):
+    indexes = {index.name : index for table in meta.tables.values () for index in table.indexes}
+    for name in names:
+        indexes[name].create (conn,checkfirst = True)
+
+def _v2 (conn,meta):
+    _addColumns (conn,meta.tables["instance"],["size","mtime","content_hash","retired"])
+    _addColumns (conn,meta.tables["verification_result"],["stale"])
+
+def _v3 (conn,meta):
+    _createIndexes (conn,meta,["ix_benchmark_name",
+                               "ix_track_name",
+                               "ix_track_bench_id",
+                               "ix_instance_name",
+                               "ix_instance_track_id",
+                               "ix_verification_result_instance_solver_date",
+                               "ix_valdidated_results_result_date"])
+
+def _v4 (conn,meta):
+    meta.tables["catalog_version"].create (conn,checkfirst = True)
+
+def _v5 (conn,meta):
+    _addColumns (conn,meta.tables["verification_result"],["solver_version"])
+    for name in ["latest_result","verification_result_archive","valdidated_results_archive"]:
+        meta.tables[name].create (conn,checkfirst = True)
+
+def _v6 (conn,meta):
+    for table in ["verification_result","latest_result","verification_result_archive"]:
+        _addColumns (conn,meta.tables[table],["solver_hash","solver_options","timeout"])
+
+def _v7 (conn,meta):
+    for table in ["verification_result","verification_result_archive"]:
+        _addColumns (conn,meta.tables[table],["wall_time","cpu_user","cpu_sys","max_rss","queue_wait","staging_time","preprocess_time"])
+
+def _v8 (conn,meta):
+    for table in ["verification_result","verification_result_archive"]:
+        _addColumns (conn,meta.tables[table],["exit_signal","stderr_tail","output_truncated"])
+
+# model texts are parsed, compressed and moved to result_model, batch by batch
+def _v9 (conn,meta,batch = 500):
+    m = meta.tables["result_model"]
+    m.create (conn,checkfirst = True)
+    for name in ["verification_result","verification_result_archive"]:
+        table = meta.tables[name]
+        _addColumns (conn,table,["model_hash"])
+        while True:
+            rows = conn.execute (sqlalchemy.select (table.c.id,table.c.model)
+                                 .where (table.c.model != None)
+                                 .limit (batch)).fetchall ()
+            if not rows:
+                break
+            for row in rows:
+                encoded = smtquery.storage.smt.models.encode (row.model)
+                if encoded != None and conn.execute (sqlalchemy.select (m.c.hash).where (m.c.hash == encoded[0])).first () == None:
+                    conn.execute (m.insert ().values (hash = encoded[0],data = encoded[1]))
+                conn.execute (table.update ().where (table.c.id == row.id)
+                              .values (model = None,model_hash = encoded[0] if encoded != None else None))
+
+def _v10 (conn,meta):
+    for table in ["verification_result","verification_result_archive"]:
+        _addColumns (conn,meta.tables[table],["winner"])
+
+def _v11 (conn,meta):
+    for table in ["verification_result","verification_result_archive"]:
+        _addColumns (conn,meta.tables[table],["repetitions","time_dispersion","noisy"])
+
+# results are shared by content hash
+def _v12 (conn,meta):
+    _createIndexes (conn,meta,["ix_instance_content_hash"])
+
+migrations = {
+    2 : _v2,
+    3 : _v3,
+    4 : _v4,
+    5 : _v5,
+    6 : _v6,
+    7 : _v7,
+    8 : _v8,
+    9 : _v9,
+    10 : _v10,
+    11 : _v11,
+    12 : _v12,
+}
+
+SCHEMA_VERSION = max (migrations.keys ())
+
+def upgrade (engine,meta,version_table):
+    with engine.begin () as conn:
+        fresh = not sqlalchemy.inspect (conn).has_table ("instance")
+        meta.create_all (conn)
+
+        row = conn.execute (sqlalchemy.select (version_table.c.version)).first ()
+        if row != None:
+            version = row.version
+        else:
+            version = SCHEMA_VERSION if fresh else 1
+
+        for v in range (version+1,SCHEMA_VERSION+1):
+            logging.getLogger ().info (f"Upgrading catalog schema to version {v}")
+            migrations[v] (conn,meta)
+        # derived tables are rebuilt once the schema is current
+        if version < SCHEMA_VERSION:
+            smtquery.storage.smt.latest.refresh (conn,meta.tables["verification_result"],meta.tables["latest_result"])
+
+        if row == None:
+            conn.execute (version_table.insert ().values (version = SCHEMA_VERSION))
+        elif version < SCHEMA_VERSION:
+            conn.execute (version_table.update ().values (version = SCHEMA_VERSION))
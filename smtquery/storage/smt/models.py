@@ -0,0 +1,125 @@
+import json
+import zlib
+import hashlib
+
+# Models are parsed once, when their result is stored, into a list of entries in model
+# order: [name,parameters,sort,value] for every define-fun and the raw text of anything
+# else (declare-sort, comments of the solver, ...). The entries are stored as zlib
+# compressed JSON in the model table, keyed by the hash of the JSON, so identical models
+# are stored once. Results refer to their model by hash and the model is only loaded
+# and decoded when it is used.
+
+# top-level items of an s-expression body: atoms, string literals and parenthesised groups
+def items (text):
+    found = []
+    depth,start,i = 0,None,0
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            end = i + 1
+            while end < len(text):
+                if text[end] == '"':
+                    # "" is an escaped quote in SMT-LIB 2.6 string literals
+                    if end + 1 < len(text) and text[end+1] == '"':
+                        end += 2
+                        continue
+                    break
+                end += 1
+            if depth == 0:
+                found.append (text[i:end+1])
+            i = end + 1
+            continue
+        if c == '|':
+            end = text.index ('|',i+1)
+            if depth == 0:
+                found.append (text[i:end+1])
+            i = end + 1
+            continue
+        if c == ';':
+            # comments end at the end of the line
+            end = text.find ('\n',i)
+            end = len(text) if end == -1 else end
+            if depth == 0:
+                found.append (text[i:end])
+            i = end
+            continue
+        if c == '(':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                found.append (text[start:i+1])
+        elif depth == 0 and not c.isspace ():
+            end = i
+            while end < len(text) and not text[end].isspace () and text[end] not in '()"|;':
+                end += 1
+            found.append (text[i:end])
+            i = end
+            continue
+        i += 1
+    return found
+
+def _entry (item):
+    parts = items (item[1:-1]) if item.startswith ("(") else []
+    if len(parts) == 5 and parts[0] == "define-fun":
+        parameters = parts[2] if parts[2][1:-1].strip () else "()"
+        return [parts[1],parameters,parts[3],parts[4]]
+    return item
+
+# entries of a model as printed by a solver: "(model ...)" or "( ... )"
+def parse (text):
+    entries = []
+    for group in items (text):
+        if not group.startswith ("("):
+            entries.append (group)
+            continue
+        body = items (group[1:-1])
+        if body and body[0] == "model":
+            body = body[1:]
+        entries.extend (_entry (item) for item in body)
+    return entries
+
+def renderEntry (entry):
+    if isinstance (entry,str):
+        return entry
+    return "(define-fun {} {} {} {})".format (*entry)
+
+# the definitions of a model, one per line, as used in a verification instance
+def renderAssignment (entries):
+    return "\n".join (renderEntry (entry) for entry in entries if not (isinstance (entry,str) and entry.startswith (";")))
+
+def render (entries):
+    return "(\n" + "\n".join ("  " + renderEntry (entry) for entry in entries) + "\n)"
+
+# (hash,blob) of a model printed by a solver, None for an empty model
+def encode (text):
+    if text == None or not text.strip ():
+        return None
+    data = json.dumps (parse (text),separators = (",",":")).encode ()
+    return hashlib.sha256 (data).hexdigest (),zlib.compress (data)
+
+def decode (blob):
+    return json.loads (zlib.decompress (blob))
+
+# a stored model, loaded by load (hash) and decoded on first use
+class StoredModel:
+    def __init__ (self,load,model_hash):
+        self._load = load
+        self._hash = model_hash
+        self._entries = None
+
+    def getHash (self):
+        return self._hash
+
+    def entries (self):
+        if self._entries == None:
+            self._entries = decode (self._load (self._hash))
+        return self._entries
+
+    def assignment (self):
+        return renderAssignment (self.entries ())
+
+    def __str__ (self):
+        return render (self.entries ())
@@ -0,0 +1,90 @@
+import os
+import hashlib
+import functools
+import concurrent.futures
+import smtquery.storage.smt.archive as archive
+
+SMT_EXTENSIONS = (".smt",".smt2",".smt25")
+
+# individually compressed instances (name.smt2.gz, ...) count as instances as well
+def isSMTFileName (name):
+    return archive.stripCompression (name).endswith (SMT_EXTENSIONS)
+
+# hashes the (decompressed) content, so an instance hashes equally wherever it is stored
+def hashFile (path):
+    with archive.openInstance (path) as ff:
+        return hashStream (ff)
+
+def hashStream (ff):
+    sha = hashlib.sha256 ()
+    for block in iter (lambda: ff.read (1 << 20),b""):
+        sha.update (block)
+    return sha.hexdigest ()
+
+# instances are (name,path,size,mtime,content_hash), the hash is only computed if requested
+def scanTrack (trackpath,hashing = False):
+    instances = []
+    with os.scandir (trackpath) as it:
+        for entry in it:
+            if isSMTFileName (entry.name):
+                st = entry.stat ()
+                content_hash = hashFile (entry.path) if hashing else None
+                instances.append ((entry.name,entry.path,st.st_size,st.st_mtime,content_hash))
+    return instances
+
+def scanBenchmark (bench,benchpath,hashing = False):
+    if archive.isArchive (benchpath):
+        return scanArchiveBenchmark (bench,benchpath,hashing)
+    tracks = []
+    with os.scandir (benchpath) as it:
+        for entry in it:
+            if not entry.is_dir ():
+                continue
+            tracks.append ((entry.name,entry.path,scanTrack (entry.path,hashing)))
+    return bench,benchpath,tracks
+
+# a bundle holds track/instance members, optionally below a single top-level directory
+def scanArchiveBenchmark (bench,benchpath,hashing = False):
+    index = archive.archiveIndex (benchpath)
+    members = list(index.members ())
+    prefix = ""
+    tops = {name.split ("/")[0] for name,size,mtime in members}
+    if len(tops) == 1 and any (name.count ("/") >= 2 for name,size,mtime in members):
+        prefix = tops.pop () + "/"
+
+    def isInstance (name):
+        parts = name[len(prefix):].split ("/")
+        return name.startswith (prefix) and len(parts) == 2 and isSMTFileName (parts[1])
+
+    # members are hashed in archive order, one pass over the archive even if it is compressed
+    hashes = dict()
+    if hashing:
+        hashes = {name : hashStream (archive.decompressed (name,ff)) for name,ff in index.stream () if isInstance (name)}
+
+    tracks = dict()
+    for name,size,mtime in sorted (members):
+        if not isInstance (name):
+            continue
+        track,instance = name[len(prefix):].split ("/")
+        tracks.setdefault (track,[]).append ((instance,archive.memberPath (benchpath,name),size,mtime,hashes.get (name)))
+    return bench,benchpath,[(track,archive.memberPath (benchpath,prefix+track),instances) for track,instances in tracks.items ()]
+
+# benchmark directories and benchmark bundles directly below root
+def benchmarkDirectories (root):
+    with os.scandir (root) as it:
+        benches = [(entry.name,entry.path) for entry in it if entry.is_dir ()]
+    with os.scandir (root) as it:
+        benches += [(archive.archiveStem (entry.name),entry.path) for entry in it if entry.is_file () and archive.isArchive (entry.name)]
+    return sorted (benches)
+
+# yields (bench,benchpath,[(track,trackpath,[instance])]) per benchmark below root,
+# benchmarks are scanned concurrently if threads > 1
+def scanRoot (root,threads = 1,hashing = False):
+    benches = benchmarkDirectories (root)
+    scan = functools.partial (scanBenchmark,hashing = hashing)
+    if threads <= 1:
+        for bench,benchpath in benches:
+            yield scan (bench,benchpath)
+    else:
+        with concurrent.futures.ThreadPoolExecutor (threads) as pool:
+            yield from pool.map (lambda b: scan (*b),benches)
@@ -0,0 +1,209 @@
+import os
+import re
+import glob
+import json
+import atexit
+import signal
+import datetime
+import threading
+import logging
+import sqlalchemy
+import smtquery.solvers.solver
+
+# Write-behind sink for solver results and verdicts. Rows are buffered and written
+# in one transaction every `rows` rows or `interval` milliseconds, whichever comes first.
+# Every row is appended to a per-process spool file before it is buffered; the spool is
+# truncated once its rows are committed, and spools left behind by crashed processes are
+# replayed when the next writer starts. Rows the database rejects for good (constraint
+# violations, invalid data) are logged and moved to a dead-letter file next to the spool,
+# results-<pid>.dead, so they do not block the rows after them.
+
+STAT_COLUMNS = ["wall_time","cpu_user","cpu_sys","max_rss","queue_wait","staging_time","preprocess_time",
+                "exit_signal","stderr_tail","output_truncated","winner",
+                "repetitions","time_dispersion","noisy"]
+
+_SPOOL = re.compile (r"results-(\d+)\.spool(?:\.replay-(\d+))?")
+_REJECTED = (sqlalchemy.exc.IntegrityError,sqlalchemy.exc.DataError)
+
+class ResultWriter:
+    def __init__ (self,store,rows = 200,interval = 500,spooldir = None):
+        self._store = store
+        self._rows = rows
+        self._interval = interval / 1000
+        self._results = []
+        self._verdicts = []
+        self._lock = threading.RLock ()
+        self._wakeup = threading.Event ()
+        self._closed = False
+        self._spool = None
+        self._spooldir = spooldir
+        if spooldir != None:
+            os.makedirs (spooldir,exist_ok = True)
+            self._replaySpools (spooldir)
+            self._spool = open (os.path.join (spooldir,f"results-{os.getpid ()}.spool"),'a')
+
+        self._thread = threading.Thread (target = self._run,daemon = True)
+        self._thread.start ()
+        atexit.register (self.close)
+        self._installSignalHandler ()
+
+    def addResult (self,result,smtfile,solver,timeout = None):
+        self._add (True,resultRow (result,smtfile,solver,timeout))
+
+    def addVerified (self,result,verified):
+        self._add (False,{"verification_result_id" : result["r_id"],
+                                   "result" : verified,
+                                   "date" : datetime.datetime.now ()})
+
+    def pending (self):
+        return len(self._results) + len(self._verdicts)
+
+    def flush (self):
+        with self._lock:
+            if self.pending () == 0:
+                return
+            self._storeRows (self._results,self._verdicts)
+            self._results = []
+            self._verdicts = []
+            if self._spool != None:
+                self._spool.truncate (0)
+                self._spool.seek (0)
+
+    def close (self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set ()
+        self.flush ()
+        if self._spool != None:
+            path = self._spool.name
+            self._spool.close ()
+            os.remove (path)
+
+    # the buffer is looked up under the lock, a concurrent flush replaces it
+    def _add (self,isresult,row):
+        with self._lock:
+            if self._spool != None:
+                self._spool.write (json.dumps (encodeRow (isresult,row)) + "\n")
+                self._spool.flush ()
+            (self._results if isresult else self._verdicts).append (row)
+            full = self.pending () >= self._rows
+        if full:
+            self._wakeup.set ()
+
+    def _run (self):
+        while not self._closed:
+            self._wakeup.wait (self._interval)
+            self._wakeup.clear ()
+            try:
+                self.flush ()
+            except Exception as e:
+                logging.getLogger ().error (f"Flushing buffered results failed: {e}")
+
+    # on a rejected batch the rows are stored one by one, removing each row from its list
+    # once it is stored or dead-lettered; other errors leave the remaining rows for a retry
+    def _storeRows (self,results,verdicts):
+        try:
+            self._store.storeRows (results,verdicts)
+            return
+        except _REJECTED:
+            pass
+        for isresult,rows in [(True,results),(False,verdicts)]:
+            while rows:
+                try:
+                    self._store.storeRows (rows[:1] if isresult else [],[] if isresult else rows[:1])
+                except _REJECTED as e:
+                    self._deadLetter (isresult,rows[0],e)
+                rows.pop (0)
+
+    def _deadLetter (self,isresult,row,error):
+        line = json.dumps (encodeRow (isresult,row),default = str)
+        logging.getLogger ().error (f"Dropping a {'result' if isresult else 'verdict'} rejected by the database: {error.orig} {line}")
+        if self._spooldir != None:
+            with open (os.path.join (self._spooldir,f"results-{os.getpid ()}.dead"),'a') as ff:
+                ff.write (line + "\n")
+
+    # a spool is claimed by renaming it to results-<pid>.spool.replay-<claimer> before it
+    # is replayed, so writers starting together never replay the same spool; spools
+    # claimed by writers that died since are claimed again
+    def _replaySpools (self,spooldir):
+        for path in glob.glob (os.path.join (spooldir,"results-*.spool*")):
+            match = _SPOOL.fullmatch (os.path.basename (path))
+            if match == None:
+                continue
+            owner = int (match.group (2) or match.group (1))
+            if owner != os.getpid () and _alive (owner):
+                continue
+            claimed = os.path.join (spooldir,f"results-{match.group (1)}.spool.replay-{os.getpid ()}")
+            try:
+                os.rename (path,claimed)
+            except FileNotFoundError:
+                # claimed by another writer
+                continue
+            results,verdicts = [],[]
+            with open (claimed,'r') as ff:
+                for line in ff:
+                    try:
+                        isresult,row = _decode (json.loads (line))
+                    except ValueError:
+                        # a partially written last line of a crashed process
+                        continue
+                    (results if isresult else verdicts).append (row)
+            if results or verdicts:
+                logging.getLogger ().info (f"Replaying {len(results)+len(verdicts)} spooled rows from {path}")
+                self._storeRows (results,verdicts)
+            os.remove (claimed)
+
+    def _installSignalHandler (self):
+        previous = signal.getsignal (signal.SIGTERM)
+        def handler (signum,frame):
+            self.close ()
+            if callable (previous):
+                previous (signum,frame)
+            else:
+                raise SystemExit (128 + signum)
+        try:
+            signal.signal (signal.SIGTERM,handler)
+        except ValueError:
+            # not the main thread, rely on atexit
+            pass
+
+def resultRow (result,smtfile,solver,timeout = None):
+    row = {"instance_id" : smtfile.getId (),
+           "result" : result.getResult (),
+           "solver" : solver.getName (),
+           "solver_version" : solver.solverVersion (),
+           "solver_hash" : solver.solverHash (),
+           "solver_options" : solver.solverOptions (),
+           "timeout" : timeout,
+           "time" : result.getTime (),
+           "model" : result.getModel (),
+           "date" : datetime.datetime.now ()}
+    row.update ({key : result.getStats ().get (key) for key in STAT_COLUMNS})
+    return row
+
+def _alive (pid):
+    try:
+        os.kill (pid,0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def encodeRow (isresult,row):
+    data = dict(row)
+    data["kind"] = "result" if isresult else "verified"
+    data["result"] = row["result"].name
+    data["date"] = row["date"].isoformat () if row["date"] != None else None
+    return data
+
+def _decode (data):
+    isresult = data.pop ("kind") == "result"
+    if isresult:
+        # spooled by a writer predating solver versions
+        for key in ["solver_version","solver_hash","solver_options","timeout"] + STAT_COLUMNS:
+            data.setdefault (key,None)
+    data["result"] = (smtquery.solvers.solver.Result if isresult else smtquery.solvers.solver.Verified)[data["result"]]
+    data["date"] = datetime.datetime.fromisoformat (data["date"]) if data["date"] != None else None
+    return isresult,data
@@ -4,6 +4,8 @@ import smtquery.tools.init as init
 import smtquery.tools.update_results as update
 import smtquery.tools.worker as worker
 import smtquery.tools.allocate_new_files as allocate
+import smtquery.tools.export as export
+import smtquery.tools.compact as compact
 
 
 tools = [qlang,
@@ -11,6 +13,8 @@ tools = [qlang,
          init,
          allocate,
          update,
-         worker
+         worker,
+         export,
+         compact
 ]
 
@@ -5,11 +5,11 @@ def getName ():
     return "allocateNew"
 
 def addArguments (parser):
-    return 
+    parser.add_argument ('--threads',type=int,default=1,help="number of threads scanning benchmark directories")
+    parser.add_argument ('--no-hash',dest="hashing",action="store_false",help="do not hash new or changed instances, changes are detected by size and mtime only")
 
 def run (arguments):
     storage = smtquery.config.conf.getStorage ()
-    storage.allocate_new_files_db ()
+    storage.allocate_new_files_db (arguments.threads,arguments.hashing)
     
 
-
@@ -0,0 +1,22 @@
+import datetime
+import smtquery.config
+import smtquery.ui
+
+def getName ():
+    return "compact"
+
+def addArguments (parser):
+    parser.add_argument ('--keep',type=int,default=0,help="superseded results kept per instance, solver and solver version")
+    parser.add_argument ('--older-than',dest="days",type=int,default=None,help="only archive results older than this many days")
+    parser.add_argument ('--archive-file',default=None,help="append archived rows to this gzipped JSON lines file instead of the archive tables")
+
+def run (arguments):
+    storage = smtquery.config.conf.getStorage ()
+    before = None
+    if arguments.days != None:
+        before = datetime.datetime.now () - datetime.timedelta (days = arguments.days)
+    with smtquery.ui.output.makeProgressor () as progress:
+        progress.message ("Compacting results")
+        moved = storage.compactResults (arguments.keep,before,arguments.archive_file)
+        target = arguments.archive_file or "the archive tables"
+        progress.message (f"Compacted results: {moved} superseded results moved to {target}")
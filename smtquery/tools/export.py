@@ -0,0 +1,139 @@
+import os
+import json
+import enum
+import shutil
+import logging
+import datetime
+import smtquery.config
+import smtquery.ui
+from smtquery.qlang.trool import Trool
+
+# Columnar export of the catalog for offline analysis. Every table is written as a directory
+# of part files (Parquet if pyarrow is available, .npz otherwise), one part per chunk of rows.
+# instances, results and verdicts are append-only: a run only exports rows with ids above
+# those recorded in export.json and adds new parts. latest (the latest non-stale result and
+# verdict per instance and solver) is rewritten on every run. features holds the intel
+# predicates of the instances exported in the same run (1 true, 0 false, -1 unknown).
+
+APPENDED = ["instances","results","verdicts"]
+
+def getName ():
+    return "export"
+
+def addArguments (parser):
+    parser.add_argument ('--output',default="data/export",help="directory receiving the exported tables")
+    parser.add_argument ('--format',choices=["auto","parquet","npz"],default="auto",help="file format, auto prefers parquet")
+    parser.add_argument ('--features',action="store_true",help="evaluate intel predicates for new instances")
+    parser.add_argument ('--full',action="store_true",help="discard previous exports and export everything")
+    parser.add_argument ('--chunksize',type=int,default=100000,help="rows per part file")
+
+def _format (requested):
+    if requested != "auto":
+        return requested
+    try:
+        import pyarrow
+        return "parquet"
+    except ImportError:
+        return "npz"
+
+def _value (value):
+    if isinstance (value,enum.Enum):
+        return value.name
+    return value
+
+def _columns (rows):
+    return {key : [_value (row[key]) for row in rows] for key in rows[0].keys ()}
+
+def _npzArray (values):
+    import numpy
+    sample = next ((v for v in values if v != None),None)
+    if isinstance (sample,bool):
+        return numpy.array ([bool (v) for v in values])
+    if isinstance (sample,int):
+        if any (v == None for v in values):
+            return numpy.array ([numpy.nan if v == None else v for v in values],dtype = float)
+        return numpy.array (values,dtype = numpy.int64)
+    if isinstance (sample,float):
+        return numpy.array ([numpy.nan if v == None else v for v in values],dtype = float)
+    if isinstance (sample,datetime.datetime):
+        return numpy.array (values,dtype = "datetime64[us]")
+    return numpy.array (["" if v == None else str (v) for v in values])
+
+def _writePart (fmt,directory,part,rows):
+    os.makedirs (directory,exist_ok = True)
+    columns = _columns (rows)
+    if fmt == "parquet":
+        import pyarrow
+        import pyarrow.parquet
+        pyarrow.parquet.write_table (pyarrow.Table.from_pydict (columns),os.path.join (directory,f"{part}.parquet"))
+    else:
+        import numpy
+        numpy.savez_compressed (os.path.join (directory,f"{part}.npz"),**{key : _npzArray (values) for key,values in columns.items ()})
+
+def _feature (value):
+    if value in (True,Trool.TT):
+        return 1
+    if value in (False,Trool.FF):
+        return 0
+    return -1
+
+def _features (storage,predicates,instances):
+    rows = []
+    for instance in instances:
+        if instance["retired"]:
+            continue
+        row = {"instance_id" : instance["id"]}
+        smtfile = storage.searchFile (*instance["name"].split (":"))
+        for name,predicate in predicates.items ():
+            try:
+                row[name] = _feature (predicate (smtfile))
+            except Exception as e:
+                logging.getLogger ().warning (f"Evaluating {name} on {instance['name']} failed: {e}")
+                row[name] = -1
+        rows.append (row)
+    return rows
+
+def _readState (path):
+    if os.path.exists (path):
+        with open (path,'r') as ff:
+            return json.load (ff)
+    return {"run" : 0, "last_id" : {kind : 0 for kind in APPENDED}}
+
+def _writeState (path,state):
+    with open (path + ".tmp",'w') as ff:
+        json.dump (state,ff)
+    os.replace (path + ".tmp",path)
+
+def run (arguments):
+    storage = smtquery.config.conf.getStorage ()
+    fmt = _format (arguments.format)
+    statepath = os.path.join (arguments.output,"export.json")
+    if arguments.full and os.path.isdir (arguments.output):
+        shutil.rmtree (arguments.output)
+    os.makedirs (arguments.output,exist_ok = True)
+    state = _readState (statepath)
+    state["run"] += 1
+    predicates = storage.storagePredicates () if arguments.features else dict()
+
+    with smtquery.ui.output.makeProgressor () as progress:
+        for kind in APPENDED:
+            exported = 0
+            for chunkno,rows in enumerate (storage.exportRows (kind,state["last_id"][kind],arguments.chunksize)):
+                part = f"part-{state['run']:05d}-{chunkno:05d}"
+                _writePart (fmt,os.path.join (arguments.output,kind),part,rows)
+                if kind == "instances" and predicates:
+                    features = _features (storage,predicates,rows)
+                    if features:
+                        _writePart (fmt,os.path.join (arguments.output,"features"),part,features)
+                state["last_id"][kind] = rows[-1]["id"]
+                exported += len(rows)
+                progress.message (f"Exporting {kind}: {exported} rows")
+
+        latest = os.path.join (arguments.output,"latest")
+        shutil.rmtree (latest,ignore_errors = True)
+        for chunkno,rows in enumerate (storage.exportLatestResults (arguments.chunksize)):
+            _writePart (fmt,latest,f"part-{chunkno:05d}",rows)
+            progress.message (f"Exporting latest results: chunk {chunkno+1}")
+
+        _writeState (statepath,state)
+        progress.message (f"Exported to {arguments.output} ({fmt}), last ids {state['last_id']}")
@@ -5,11 +5,11 @@ def getName ():
     return "initdb"
 
 def addArguments (parser):
-    return 
-
+    parser.add_argument ('--threads',type=int,default=1,help="number of threads scanning benchmark directories")
+    parser.add_argument ('--no-hash',dest="hashing",action="store_false",help="do not store the content hash of instances")
+    
 def run (arguments):
     storage = smtquery.config.conf.getStorage ()
-    storage.initialise_db ()
+    storage.initialise_db (arguments.threads,arguments.hashing)
     
 
-
@@ -32,6 +32,9 @@ def run (arguments):
 
     for name in smtquery.config.conf.getSolvers ().keys():
         predicates[f"isCorrect({name})"] = smtquery.qlang.predicates.makeIsCorrectPredicate (name)
+
+    for name in smtquery.config.conf.getSolvers ().keys():
+        predicates[f"isNoisy({name})"] = smtquery.qlang.predicates.makeNoisyPredicate (name)
     
     for s1,s2 in product(smtquery.config.conf.getSolvers ().keys(),smtquery.config.conf.getSolvers ().keys()):
         predicates[f"isFaster({s1},{s2})"] = smtquery.qlang.predicates.makeFasterPredicate (s1,s2)
@@ -1,27 +1,114 @@
+import logging
 import smtquery.storage.smt.fs
 import smtquery.scheduling
+import smtquery.solvers.solver
 
 
 def getName ():
     return "updateResults"
 
 def addArguments (parser):
-    return 
+    parser.add_argument ('--escalate',type=float,default=None,metavar="SECONDS",
+                         help="run everything at this timeout first, then rerun only timeouts at growing timeouts up to the configured one")
+    parser.add_argument ('--factor',type=float,default=4,help="growth of the timeout between escalation levels")
+
+# timeouts of the escalation levels: start, start*factor, ... and finally the maximum
+def _levels (start,factor,maximum):
+    if factor <= 1:
+        raise ValueError ("The escalation factor has to be greater than 1")
+    levels = []
+    timeout = start
+    while timeout < maximum:
+        levels.append (timeout)
+        timeout *= factor
+    return levels + [maximum]
 
 def run (args):
     solvers = smtquery.config.conf.getSolvers ()
     storage = smtquery.config.conf.getStorage ()
-    schedule = smtquery.config.conf.getScheduler ()
     run_parameters = smtquery.config.conf.getRunParameters ()
-    ll = []
+    if args.escalate != None:
+        levels = _levels (args.escalate,args.factor,run_parameters["timeout"])
+    else:
+        levels = [run_parameters["timeout"]]
+
+    runs = 0
+    skipped = 0
     with smtquery.ui.output.makeProgressor () as progress:
-        for file in storage.allFiles ():
-            for key,solver in solvers.items ():
-                progress.message (f"Submitting {key} to {file.getName ()}")
-                res = schedule.runSolver (solver,file,run_parameters["timeout"])
-                ll.append (res)
-        progress.message (f"Waiting for results ... ")
-                
-        for r in ll:
-            r.wait ()
-                
+        # (file,solvername) pairs left for the next level, all pairs on the first
+        pending = None
+        for level,timeout in enumerate (levels):
+            prefix = f"Level {level+1}/{len(levels)} ({timeout}s): " if len(levels) > 1 else ""
+            batches = _allPairs (storage,solvers) if pending == None else _batches (pending)
+            pending,levelruns,levelskipped = _runLevel (batches,timeout,levels[-1],progress,prefix)
+            runs += levelruns
+            skipped += levelskipped
+            if not pending:
+                break
+        progress.message (f"Updated results: {runs} runs, {skipped} cached")
+
+# submits the runs of one level and waits for them, returns the pairs that timed out
+# below the final timeout
+def _runLevel (batches,timeout,final,progress,prefix):
+    solvers = smtquery.config.conf.getSolvers ()
+    storage = smtquery.config.conf.getStorage ()
+    schedule = smtquery.config.conf.getScheduler ()
+    escalate = timeout < final
+    ll = []
+    timedout = []
+    skipped = 0
+    for pairs in batches:
+        ids = list({file.getId () for file,key in pairs})
+        # runs with a valid cached result (same content, binary, options and timeout) are skipped,
+        # when escalating also those already settled for the final timeout
+        cached = storage.cachedResults (ids,solvers,timeout,repetitions = schedule.getRepetitions ())
+        settled = storage.cachedRuns (ids,solvers,final,repetitions = schedule.getRepetitions ()) if escalate else set ()
+        for file,key in pairs:
+            if (file.getId (),key) in settled:
+                skipped += 1
+                continue
+            if (file.getId (),key) in cached:
+                skipped += 1
+                if cached[(file.getId (),key)] == smtquery.solvers.solver.Result.TimeOut:
+                    timedout.append ((file,key))
+                continue
+            progress.message (f"{prefix}Submitting {key} to {file.getName ()}")
+            ll.append ((file,key,schedule.runSolver (solvers[key],file,timeout)))
+    progress.message (f"{prefix}Waiting for results ({len(ll)} runs, {skipped} cached) ... ")
+
+    for file,key,r in ll:
+        r.wait ()
+        if not escalate:
+            continue
+        # the next level needs the results of this one
+        try:
+            result = schedule.interpretSolverRes (r).getResult ()
+        except Exception as e:
+            logging.getLogger ().error (f"Running {key} on {file.getName ()} failed: {e}")
+            continue
+        if result == smtquery.solvers.solver.Result.TimeOut:
+            timedout.append ((file,key))
+    return (timedout if escalate else []),len(ll),skipped
+
+# (file,solvername) pairs of all instances, instances with identical stored content hashes
+# share their results; nothing is hashed here, so the key matches the one of the result queries
+def _allPairs (storage,solvers):
+    submitted = set ()
+    for files in _batches (storage.allFiles ()):
+        pairs = []
+        for file in files:
+            if file.contentKey () in submitted:
+                continue
+            submitted.add (file.contentKey ())
+            pairs.extend ((file,key) for key in solvers.keys ())
+        yield pairs
+
+def _batches (files,size = 500):
+    batch = []
+    for file in files:
+        batch.append (file)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,42 @@
+import io
+import pytest
+import smtquery.config
+import smtquery.solvers.portfolio
+
+CONFIG = """
+solvers:
+  Z3Str3:
+    binary: /usr/bin/z3
+  Z3Seq:
+    binary: /usr/bin/z3
+  Portfolio:
+    members: [Z3Str3,Z3Seq]
+verifiers: [Portfolio]
+runParameters:
+  timeout: 10
+SMTStore:
+  name: FS
+  root: {root}
+scheduler:
+  name: multiprocessing
+  cores: 1
+"""
+
+def _readConfig (root,text = CONFIG):
+    smtquery.config.readConfig (io.StringIO (text.format (root = root)))
+    return smtquery.config.conf
+
+def test_portfolio_verifier_resolves_members (tmp_path):
+    conf = _readConfig (tmp_path)
+    verifiers = conf.getVerifiers ()
+    assert list(verifiers.keys ()) == ["Portfolio"]
+    assert isinstance (verifiers["Portfolio"],smtquery.solvers.portfolio.Portfolio)
+    assert list(verifiers["Portfolio"].getMembers ().keys ()) == ["Z3Str3","Z3Seq"]
+
+def test_portfolio_unknown_member (tmp_path):
+    with pytest.raises (ValueError,match = "CVC4"):
+        _readConfig (tmp_path,CONFIG.replace ("[Z3Str3,Z3Seq]","[Z3Str3,CVC4]"))
+
+def test_portfolio_without_known_solvers ():
+    with pytest.raises (ValueError,match = "Z3Str3"):
+        smtquery.config.createSolvers ({"Portfolio" : {"members" : ["Z3Str3"]}})
@@ -0,0 +1,28 @@
+import sys
+import smtquery.solvers.interactive
+
+# answers sat to every check-sat and echoes strings as SMT-LIB 2.6 string literals
+SOLVER = r"""
+import re,sys
+for line in sys.stdin:
+    for m in re.finditer (r'\(echo ("[^"]*")\)|\(check-sat\)',line):
+        print (m.group (1) if m.group (1) else "sat",flush = True)
+"""
+
+def _process (tmp_path):
+    script = tmp_path / "solver.py"
+    script.write_text (SOLVER)
+    return smtquery.solvers.interactive.InteractiveProcess ([sys.executable,str (script)])
+
+def test_quoted_sentinel (tmp_path):
+    proc = _process (tmp_path)
+    assert proc.run ("(check-sat)",10) [::2] == ("sat\n","ok")
+    assert proc.run ("(check-sat)",10) [::2] == ("sat\n","ok")
+    proc.close ()
+
+def test_output_larger_than_the_pipe (tmp_path):
+    proc = _process (tmp_path)
+    stdout,elapsed,status = proc.run ("(check-sat)\n" * 100000,30)
+    assert status == "ok"
+    assert stdout.count ("sat") == 100000
+    proc.close ()
@@ -0,0 +1,38 @@
+import os
+import time
+import smtquery.solvers.preprocessed as preprocessed
+
+def _write (size):
+    def write (path):
+        with open (path,'w') as ff:
+            ff.write ("x" * size)
+    return write
+
+def test_cache_is_private (tmp_path):
+    preprocessed.configure (str (tmp_path / "cache"))
+    path = preprocessed.store ("Z3-1","abc",_write (10))
+    assert preprocessed.lookup ("Z3-1","abc") == path
+    assert os.stat (tmp_path / "cache").st_mode & 0o777 == 0o700
+
+def test_shared_directory_is_not_used (tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir (mode = 0o777)
+    os.chmod (shared,0o777)
+    preprocessed.configure (str (shared))
+    assert preprocessed.cachePath ("Z3-1","abc") == None
+    assert preprocessed.lookup ("Z3-1","abc") == None
+
+def test_least_recently_used_entries_are_evicted (tmp_path):
+    preprocessed.configure (str (tmp_path / "cache"),size = 3500 / (1024 * 1024))
+    old = time.time () - 3600
+    for i in range (3):
+        path = preprocessed.store ("Z3-1",f"h{i}",_write (1000))
+        os.utime (path,(old + i,old + i))
+    # used since, so the oldest one left is h1
+    preprocessed.lookup ("Z3-1","h0")
+    preprocessed.store ("Z3-1","h3",_write (1000))
+    assert preprocessed.lookup ("Z3-1","h1") == None
+    assert all (preprocessed.lookup ("Z3-1",h) != None for h in ["h0","h2","h3"])
+
+def teardown_function ():
+    preprocessed.configure ()
@@ -0,0 +1,81 @@
+import json
+import multiprocessing
+import sqlalchemy
+import smtquery.storage.smt.writer
+from smtquery.solvers.solver import Verified
+
+# rejects every batch holding a verdict of the bad result id, like a foreign key would
+class Store:
+    def __init__ (self,bad):
+        self.bad = bad
+        self.stored = []
+
+    def storeRows (self,results,verdicts):
+        if any (row["verification_result_id"] == self.bad for row in verdicts):
+            raise sqlalchemy.exc.IntegrityError ("INSERT",None,Exception ("FOREIGN KEY constraint failed"))
+        self.stored.extend (row["verification_result_id"] for row in verdicts)
+
+def _writer (store,spooldir):
+    return smtquery.storage.smt.writer.ResultWriter (store,rows = 1000,interval = 60000,spooldir = str (spooldir))
+
+def test_rejected_row_does_not_block_flush (tmp_path):
+    store = Store (1)
+    writer = _writer (store,tmp_path)
+    for r_id in [1,2,3]:
+        writer.addVerified ({"r_id" : r_id},Verified.VerifiedSAT)
+    writer.flush ()
+    assert store.stored == [2,3]
+    assert writer.pending () == 0
+
+    writer.addVerified ({"r_id" : 4},Verified.Majority)
+    writer.flush ()
+    assert store.stored == [2,3,4]
+
+    dead = list(tmp_path.glob ("*.dead"))
+    assert len(dead) == 1
+    rows = [json.loads (line) for line in dead[0].read_text ().splitlines ()]
+    assert [row["verification_result_id"] for row in rows] == [1]
+    writer.close ()
+
+def test_rejected_row_in_replayed_spool (tmp_path):
+    # spool left behind by a crashed writer
+    encode = smtquery.storage.smt.writer.encodeRow
+    rows = [{"verification_result_id" : r_id,"result" : Verified.VerifiedSAT,"date" : None} for r_id in [1,2]]
+    (tmp_path / "results-999999999.spool").write_text ("".join (json.dumps (encode (False,row)) + "\n" for row in rows))
+    store = Store (1)
+    _writer (store,tmp_path).close ()
+    assert store.stored == [2]
+    assert list(tmp_path.glob ("*.spool")) == []
+    assert len(list(tmp_path.glob ("*.dead"))) == 1
+
+# records the stored verdicts in a file shared by processes
+class SharedStore (Store):
+    def __init__ (self,path):
+        super().__init__ (None)
+        self.path = path
+
+    def storeRows (self,results,verdicts):
+        with open (self.path,'a') as ff:
+            ff.write ("".join (f"{row['verification_result_id']}\n" for row in verdicts))
+
+def test_spool_replayed_once (tmp_path):
+    spooldir = tmp_path / "spool"
+    spooldir.mkdir ()
+    encode = smtquery.storage.smt.writer.encodeRow
+    def spool (name,ids):
+        rows = [{"verification_result_id" : r_id,"result" : Verified.VerifiedSAT,"date" : None} for r_id in ids]
+        (spooldir / name).write_text ("".join (json.dumps (encode (False,row)) + "\n" for row in rows))
+    spool ("results-999999998.spool",[2,3])
+    # claimed by a writer that died while replaying
+    spool ("results-999999997.spool.replay-999999996",[4])
+    store = SharedStore (tmp_path / "stored")
+    # writers starting together in several processes
+    context = multiprocessing.get_context ("fork")
+    writers = [context.Process (target = lambda: _writer (store,spooldir).close ()) for _ in range (4)]
+    for writer in writers:
+        writer.start ()
+    for writer in writers:
+        writer.join ()
+        assert writer.exitcode == 0
+    assert sorted (int (line) for line in (tmp_path / "stored").read_text ().split ()) == [2,3,4]
+    assert list(spooldir.iterdir ()) == []